@@ -0,0 +1,47 @@
+"""search index
+
+One FTS5 table per searchable kind, filled from the existing rows. Replaces
+the single search_index table that earlier code created on its own.
+
+Revision ID: 0af6fd3e71a9
+Revises: 69596765ea59
+Create Date: 2026-10-18 07:53:06.312008
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0af6fd3e71a9'
+down_revision = '69596765ea59'
+branch_labels = None
+depends_on = None
+
+# FTS table -> (source table, indexed column), as in website/search_index.py
+INDEXES = {
+    'search_index_user': ('user', 'username'),
+    'search_index_post': ('post', 'text'),
+    'search_index_art': ('art', 'title'),
+    'search_index_video': ('video', 'title'),
+}
+
+
+def upgrade():
+    op.execute("DROP TABLE IF EXISTS search_index")
+    for index, (table, column) in INDEXES.items():
+        op.execute(f"DROP TABLE IF EXISTS {index}")
+        op.execute(
+            f"CREATE VIRTUAL TABLE {index} USING fts5("
+            f"body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            f"INSERT INTO {index} (rowid, body) "
+            f'SELECT id, {column} FROM "{table}" '
+            f"WHERE {column} IS NOT NULL AND {column} != ''"
+        )
+
+
+def downgrade():
+    for index in INDEXES:
+        op.execute(f"DROP TABLE IF EXISTS {index}")
@@ -0,0 +1,153 @@
+"""baseline schema
+
+The tables as schema.sql created them before migrations were kept. A
+database made from that schema.sql already has them: run
+"flask db stamp 84a1b5cd0525" once, then "flask db upgrade".
+
+Revision ID: 84a1b5cd0525
+Revises: 
+Create Date: 2026-10-18 07:52:49.009851
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '84a1b5cd0525'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('email', sa.String(length=125), nullable=True),
+    sa.Column('username', sa.String(length=60), nullable=True),
+    sa.Column('password', sa.String(length=100), nullable=True),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('bio', sa.Text(), server_default='', nullable=True),
+    sa.Column('profile_pic', sa.String(length=300), server_default='default.png', nullable=True),
+    sa.Column('profile_image', sa.String(length=150), nullable=True),
+    sa.CheckConstraint('length(email) <= 125'),
+    sa.CheckConstraint('length(username) <= 60'),
+    sa.CheckConstraint('length(password) <= 100'),
+    sa.CheckConstraint('length(profile_pic) <= 300'),
+    sa.CheckConstraint('length(profile_image) <= 150'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username'),
+    sqlite_autoincrement=True
+    )
+    op.create_table('follow',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('follower_id', sa.Integer(), nullable=True),
+    sa.Column('followed_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['followed_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('post',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('comment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.String(length=225), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.CheckConstraint('length(text) <= 225'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('art',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=150), nullable=True),
+    sa.Column('art', sa.String(length=150), nullable=True),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.CheckConstraint('length(title) <= 150'),
+    sa.CheckConstraint('length(art) <= 150'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('art_comment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.String(length=225), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('art_id', sa.Integer(), nullable=False),
+    sa.CheckConstraint('length(text) <= 225'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['art_id'], ['art.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('video',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=150), nullable=True),
+    sa.Column('video', sa.String(length=150), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('views', sa.Integer(), server_default=sa.text('0'), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.CheckConstraint('length(title) <= 150'),
+    sa.CheckConstraint('length(video) <= 150'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('video_comment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.String(length=500), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.CheckConstraint('length(text) <= 500'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['video_id'], ['video.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('likes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('post_type', sa.String(length=10), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('length(post_type) <= 10'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'post_id', 'post_type', name='unique_like')
+    )
+    op.create_table('notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('from_user_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=True),
+    sa.Column('object_type', sa.String(length=20), nullable=True),
+    sa.Column('is_read', sa.Boolean(), server_default=sa.text('0'), nullable=True),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('length(type) <= 20'),
+    sa.CheckConstraint('length(object_type) <= 20'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['from_user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('notification')
+    op.drop_table('likes')
+    op.drop_table('video_comment')
+    op.drop_table('video')
+    op.drop_table('art_comment')
+    op.drop_table('art')
+    op.drop_table('comment')
+    op.drop_table('post')
+    op.drop_table('follow')
+    op.drop_table('user')
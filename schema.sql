@@ -4,15 +4,36 @@ CREATE TABLE user (
     email VARCHAR(125) UNIQUE,
     username VARCHAR(60) UNIQUE,
     password VARCHAR(100),
+    account_verified INTEGER,
+    is_verified BOOLEAN,
     date_created DATETIME,
-    bio TEXT DEFAULT "",
-    profile_pic VARCHAR(300) DEFAULT "default.png",
+    bio TEXT DEFAULT '',
+    profile_pic VARCHAR(300) DEFAULT 'default.png',
     profile_image VARCHAR(150),
+    profile_thumb VARCHAR(150),
+    unread_notifications INTEGER NOT NULL DEFAULT 0,
+    follower_count INTEGER NOT NULL DEFAULT 0,
+    following_count INTEGER NOT NULL DEFAULT 0,
     CHECK (length(email) <= 125),
     CHECK (length(username) <= 60),
-    CHECK (length(password) <= 100),
     CHECK (length(profile_pic) <= 300),
-    CHECK (length(profile_image) <= 150)
+    CHECK (length(profile_image) <= 150),
+    CHECK (length(profile_thumb) <= 150)
+);
+
+CREATE UNIQUE INDEX ix_user_username ON user (username);
+
+-- Verification links table
+CREATE TABLE verification_links (
+    id INTEGER PRIMARY KEY
+);
+
+-- Followers association table (declared in models.py)
+CREATE TABLE followers (
+    follower_id INTEGER,
+    followed_id INTEGER,
+    FOREIGN KEY (follower_id) REFERENCES user (id),
+    FOREIGN KEY (followed_id) REFERENCES user (id)
 );
 
 -- Follow table
@@ -21,18 +42,26 @@ CREATE TABLE follow (
     follower_id INTEGER,
     followed_id INTEGER,
     FOREIGN KEY (follower_id) REFERENCES user (id),
-    FOREIGN KEY (followed_id) REFERENCES user (id)
+    FOREIGN KEY (followed_id) REFERENCES user (id),
+    CONSTRAINT unique_follow UNIQUE (follower_id, followed_id)
 );
 
+CREATE INDEX ix_follow_followed_id ON follow (followed_id);
+CREATE INDEX ix_follow_follower_id ON follow (follower_id);
+
 -- Post table
 CREATE TABLE post (
     id INTEGER PRIMARY KEY,
     text TEXT NOT NULL,
     date_created DATETIME,
     user_id INTEGER NOT NULL,
+    like_count INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
 );
 
+CREATE INDEX ix_post_date_created_id ON post (date_created, id);
+CREATE INDEX ix_post_user_date_id ON post (user_id, date_created, id);
+
 -- Comment table
 CREATE TABLE comment (
     id INTEGER PRIMARY KEY,
@@ -45,18 +74,26 @@ CREATE TABLE comment (
     CHECK (length(text) <= 225)
 );
 
+CREATE INDEX ix_comment_post_date ON comment (post_id, date_created);
+
 -- Art table
 CREATE TABLE art (
     id INTEGER PRIMARY KEY,
     title VARCHAR(150),
     art VARCHAR(150),
+    thumbnail VARCHAR(150),
     date_created DATETIME,
     user_id INTEGER NOT NULL,
+    like_count INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
     CHECK (length(title) <= 150),
-    CHECK (length(art) <= 150)
+    CHECK (length(art) <= 150),
+    CHECK (length(thumbnail) <= 150)
 );
 
+CREATE INDEX ix_art_date_created_id ON art (date_created, id);
+CREATE INDEX ix_art_user_date_id ON art (user_id, date_created, id);
+
 -- ArtComment table
 CREATE TABLE art_comment (
     id INTEGER PRIMARY KEY,
@@ -69,19 +106,27 @@ CREATE TABLE art_comment (
     CHECK (length(text) <= 225)
 );
 
+CREATE INDEX ix_art_comment_art_date ON art_comment (art_id, date_created);
+
 -- Video table
 CREATE TABLE video (
     id INTEGER PRIMARY KEY,
     title VARCHAR(150),
     video VARCHAR(150) NOT NULL,
+    poster VARCHAR(150),
     date_created DATETIME,
     views INTEGER DEFAULT 0,
     user_id INTEGER NOT NULL,
+    like_count INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
     CHECK (length(title) <= 150),
-    CHECK (length(video) <= 150)
+    CHECK (length(video) <= 150),
+    CHECK (length(poster) <= 150)
 );
 
+CREATE INDEX ix_video_date_created_id ON video (date_created, id);
+CREATE INDEX ix_video_user_date_id ON video (user_id, date_created, id);
+
 -- VideoComment table
 CREATE TABLE video_comment (
     id INTEGER PRIMARY KEY,
@@ -94,6 +139,54 @@ CREATE TABLE video_comment (
     CHECK (length(text) <= 500)
 );
 
+CREATE INDEX ix_video_comment_video_date ON video_comment (video_id, date_created);
+
+-- MediaJob table
+CREATE TABLE media_job (
+    id INTEGER PRIMARY KEY,
+    kind VARCHAR(10) NOT NULL,
+    object_id INTEGER NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    date_created DATETIME,
+    date_updated DATETIME,
+    CHECK (length(kind) <= 10),
+    CHECK (length(status) <= 10)
+);
+
+CREATE INDEX ix_media_job_status_id ON media_job (status, id);
+
+-- Media blob table (content-addressed files)
+CREATE TABLE media_blob (
+    hash VARCHAR(64) PRIMARY KEY,
+    ext VARCHAR(10) NOT NULL,
+    size BIGINT NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    date_created DATETIME,
+    date_updated DATETIME,
+    CHECK (length(ext) <= 10)
+);
+
+CREATE INDEX ix_media_blob_refcount_updated ON media_blob (refcount, date_updated);
+
+-- Upload table
+CREATE TABLE upload (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    title VARCHAR(150),
+    filename VARCHAR(150) NOT NULL,
+    total_size BIGINT NOT NULL,
+    received BIGINT NOT NULL DEFAULT 0,
+    claim VARCHAR(32),
+    claimed_at DATETIME,
+    checksum VARCHAR(64),
+    date_created DATETIME,
+    FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+    CHECK (length(title) <= 150),
+    CHECK (length(filename) <= 150)
+);
+
 -- Like table
 CREATE TABLE likes (
     id INTEGER PRIMARY KEY,
@@ -106,6 +199,8 @@ CREATE TABLE likes (
     CHECK (length(post_type) <= 10)
 );
 
+CREATE INDEX ix_likes_post ON likes (post_id, post_type);
+
 -- Notification table
 CREATE TABLE notification (
     id INTEGER PRIMARY KEY,
@@ -116,8 +211,67 @@ CREATE TABLE notification (
     object_type VARCHAR(20),
     is_read BOOLEAN DEFAULT 0,
     date_created DATETIME,
+    actor_count INTEGER NOT NULL DEFAULT 1,
+    recent_actor_ids VARCHAR(100),
     FOREIGN KEY (user_id) REFERENCES user (id),
     FOREIGN KEY (from_user_id) REFERENCES user (id),
     CHECK (length(type) <= 20),
-    CHECK (length(object_type) <= 20)
+    CHECK (length(object_type) <= 20),
+    CHECK (length(recent_actor_ids) <= 100)
+);
+
+CREATE INDEX ix_notification_user_read_date ON notification (user_id, is_read, date_created);
+CREATE INDEX ix_notification_user_date_id ON notification (user_id, date_created, id);
+
+-- NotificationActor table (everyone folded into a like/follow notification)
+CREATE TABLE notification_actor (
+    id INTEGER PRIMARY KEY,
+    notification_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    FOREIGN KEY (notification_id) REFERENCES notification (id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+    CONSTRAINT unique_notification_actor UNIQUE (notification_id, user_id)
+);
+
+-- TimelineEntry table
+CREATE TABLE timeline_entry (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    object_type VARCHAR(10) NOT NULL,
+    object_id INTEGER NOT NULL,
+    date_created DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES user (id) ON DELETE CASCADE,
+    CONSTRAINT unique_timeline_entry UNIQUE (user_id, object_type, object_id),
+    CHECK (length(object_type) <= 10)
+);
+
+CREATE INDEX ix_timeline_entry_user_date ON timeline_entry (user_id, date_created, object_type, object_id);
+CREATE INDEX ix_timeline_entry_object ON timeline_entry (object_type, object_id);
+
+-- Full-text search indexes (see website/search_index.py), one per kind;
+-- rowid is the id of the user, post, art or video
+CREATE VIRTUAL TABLE search_index_user USING fts5(
+    body,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE search_index_post USING fts5(
+    body,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE search_index_art USING fts5(
+    body,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE search_index_video USING fts5(
+    body,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
 );
@@ -0,0 +1,47 @@
+import os
+import pytest
+from flask_migrate import upgrade
+from website import create_app, db
+from website.cache import query_cache
+from website.models import User
+
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a fresh database migrated to head, inside an app context."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'PASSWORD_HASH_WORKERS': 0,
+    })
+    # The cache outlives the app; another test's entries could match here
+    query_cache.backend.clear()
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username):
+        user = User(email=f"{username}@example.com", username=username, password="x", is_verified=True)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def client_for(app):
+    """A test client signed in as the given user."""
+    def client_for(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return client_for
@@ -0,0 +1,16 @@
+from website.models import Notification
+
+
+def test_seed_and_run(app):
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['bench', 'seed', '--users', '20'])
+    assert result.exit_code == 0, result.output
+    assert 'Seeded' in result.output
+    # Rows of every type go in as one executemany; none may lose its columns
+    assert Notification.query.filter(
+        Notification.type != 'follow', Notification.object_id == None
+    ).count() == 0
+
+    result = runner.invoke(args=['bench', 'run', '--requests', '5', '--warmup', '1'])
+    assert result.exit_code == 0, result.output
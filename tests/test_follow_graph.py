@@ -0,0 +1,35 @@
+from website import db, follow_graph, timeline
+from website.models import User, Follow
+
+
+def counts(*users):
+    db.session.expire_all()
+    return [(db.session.get(User, u.id).follower_count, db.session.get(User, u.id).following_count)
+            for u in users]
+
+
+def test_follow_counts_once(app, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+
+    assert follow_graph.follow(alice.id, bob.id)
+    assert not follow_graph.follow(alice.id, bob.id)
+    db.session.commit()
+
+    assert Follow.query.count() == 1
+    assert counts(alice, bob) == [(0, 1), (1, 0)]
+
+
+def test_failure_after_insert_leaves_nothing_behind(app, make_user, client_for, monkeypatch):
+    alice, bob = make_user("alice"), make_user("bob")
+    client = client_for(alice)
+
+    def fail(follower_id, followed_id):
+        raise RuntimeError("backfill failed")
+    monkeypatch.setattr(timeline, 'backfill', fail)
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    assert client.get(f'/follow/{bob.id}').status_code == 500
+
+    db.session.rollback()
+    assert Follow.query.count() == 0
+    assert counts(alice, bob) == [(0, 0), (0, 0)]
+    assert follow_graph.recount() == 0
@@ -0,0 +1,40 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from website import db
+from website.models import User
+from website.security import login_throttle
+
+
+@pytest.fixture
+def alice(app):
+    app.config.update(LOGIN_FAILURES_PER_ACCOUNT=3, LOGIN_FAILURES_PER_ACCOUNT_TOTAL=10)
+    login_throttle.init_app(app)
+    db.session.add(User(
+        email='alice@example.com', username='alice', is_verified=True,
+        # Few iterations: the test is about counting, not hashing
+        password=generate_password_hash('correct horse', 'pbkdf2:sha256:1000')
+    ))
+    db.session.commit()
+
+
+def sign_in(client, password, ip):
+    return client.post(
+        '/login',
+        data={'email': 'alice@example.com', 'password': password},
+        environ_base={'REMOTE_ADDR': ip}
+    )
+
+
+def test_guessing_from_one_address_does_not_lock_out_the_owner(app, alice):
+    client = app.test_client()
+    for _ in range(3):
+        assert sign_in(client, 'wrong', '10.0.0.1').status_code == 200
+    assert sign_in(client, 'wrong', '10.0.0.1').status_code == 429
+    assert sign_in(client, 'correct horse', '10.0.0.2').status_code == 302
+
+
+def test_guessing_spread_over_addresses_locks_the_account(app, alice):
+    client = app.test_client()
+    for n in range(10):
+        assert sign_in(client, 'wrong', f'10.0.1.{n}').status_code == 200
+    assert sign_in(client, 'wrong', '10.0.2.1').status_code == 429
@@ -0,0 +1,8 @@
+def test_query_stats_hidden_unless_profiling(app, make_user, client_for):
+    client = client_for(make_user("alice"))
+
+    app.config['QUERY_PROFILER'] = False
+    assert client.get('/debug/queries').status_code == 404
+
+    app.config['QUERY_PROFILER'] = True
+    assert client.get('/debug/queries').status_code == 200
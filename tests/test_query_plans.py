@@ -0,0 +1,10 @@
+from website import query_plans
+
+
+def test_hot_queries_use_an_index(app):
+    failures = {
+        name: plan
+        for name, (plan, problems) in query_plans.check_plans().items()
+        if problems
+    }
+    assert failures == {}
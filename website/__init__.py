@@ -1,15 +1,47 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from os import path
+import os
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 import sqlite3
+from .routing import RoutingSession, init_replicas
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 DB_NAME = "database.db"
 
+# Engine tuning picked by NEWLAND_DB_PROFILE (config key or environment
+# variable). "dev" keeps SQLite's defaults: rollback journal, default pool.
+DB_PROFILES = {
+    'dev': {
+        'pragmas': {},
+        'engine_options': {},
+    },
+    'production': {
+        # WAL lets readers carry on while one writer commits, and makes
+        # synchronous=NORMAL safe (only the last commits can be lost on power
+        # failure, never corrupted). busy_timeout makes writers queue for
+        # the lock instead of failing with "database is locked".
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 5000,              # ms
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,    # bytes
+            'cache_size': -64 * 1024,          # negative means KiB
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 10,
+            'connect_args': {'timeout': 5, 'check_same_thread': False},
+        },
+    },
+}
+
 
 @event.listens_for(Engine, "connect")
 def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
@@ -18,25 +50,97 @@ def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
 
-def create_app():
+
+def apply_sqlite_pragmas(engine, pragmas):
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = "helloworld"
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('NEWLAND_DATABASE_URI', f'sqlite:///{DB_NAME}')
     app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024  # 200MB
+    app.config['NEWLAND_DB_PROFILE'] = os.environ.get('NEWLAND_DB_PROFILE', 'dev')
+    # Read-only copies of the primary, e.g. "sqlite:///file:replica.db?mode=ro&uri=true"
+    app.config['SQLALCHEMY_REPLICA_URIS'] = [
+        uri for uri in os.environ.get('NEWLAND_REPLICA_URIS', '').split(',') if uri
+    ]
+    # Reverse proxies in front of the app; their X-Forwarded-* headers are
+    # trusted for this many hops, so remote_addr is the client's address
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('NEWLAND_TRUSTED_PROXIES', 0))
+    # Shared query/fragment cache; without it each worker caches on its own
+    app.config['CACHE_REDIS_URL'] = os.environ.get('NEWLAND_CACHE_REDIS_URL')
+    if config:
+        app.config.from_mapping(config)
+
+    proxies = app.config['TRUSTED_PROXIES']
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+
+    profile = DB_PROFILES[app.config['NEWLAND_DB_PROFILE']]
+    app.config.setdefault('SQLITE_PRAGMAS', profile['pragmas'])
+    engine_options = dict(profile['engine_options'])
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
 
     db.init_app(app)
 
+    replicas = init_replicas(app, engine_options)
+
+    with app.app_context():
+        for engine in [db.engine] + replicas:
+            apply_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
 
-    migrate = Migrate(app, db)
+
+    # Batch mode lets migrations alter constraints on SQLite
+    migrate = Migrate(app, db, render_as_batch=True)
 
 
     from .views import views
     from .auth import auth
     from .video_api import video_api
+    from .uploads import uploads
+    from .media_store import media_store, media_url
+    from .typeahead import typeahead
+    from .cache import cache_stats, query_cache, load_user as cached_user
+    from .profiler import profiler_stats, query_profiler
 
     app.register_blueprint(views, url_prefix="/")
     app.register_blueprint(auth, url_prefix="/")
     app.register_blueprint(video_api, url_prefix="/")
+    app.register_blueprint(uploads, url_prefix="/")
+    app.register_blueprint(media_store, url_prefix="/")
+    app.register_blueprint(typeahead, url_prefix="/")
+    app.register_blueprint(cache_stats, url_prefix="/")
+    app.register_blueprint(profiler_stats, url_prefix="/")
+    app.add_template_global(media_url)
+
+    from .fragments import cached_fragment
+    app.add_template_global(cached_fragment)
+
+    from . import commands
+    commands.init_app(app)
+
+    from .view_counter import view_counter
+    view_counter.init_app(app)
+
+    from .media_jobs import media_worker
+    media_worker.init_app(app)
+
+    query_cache.init_app(app)
+    query_profiler.init_app(app)
+
+    from .security import password_hasher, login_throttle
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
     
 
     from .models import User, Post, Comment, Like, Video
@@ -50,7 +154,7 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(id):
-        return User.query.get(int(id))
+        return cached_user(int(id))
 
     return app
 
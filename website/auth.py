@@ -1,8 +1,11 @@
 from flask import Blueprint,render_template, redirect, url_for, request, flash
 from . import db
 from .models import User, VerificationLinks
+from . import media_jobs
+from . import media_store
+from .typeahead import username_index
+from .security import password_hasher, login_throttle, Overloaded, MAX_PASSWORD_LENGTH
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import os
@@ -13,34 +16,47 @@ import uuid
 auth = Blueprint("auth", __name__)
 now = datetime.now()
 
+
+def busy(template):
+    flash('We are handling a lot of sign-ins right now. Please try again in a moment.', category='error')
+    return render_template(template, user=current_user), 503, {'Retry-After': '5'}
+
+
 @auth.route('/login', methods=['GET','POST'])
 def login():
     if request.method == 'POST':
-        email = request.form.get("email")
-        password = request.form.get("password")
+        email = request.form.get("email") or ''
+        password = request.form.get("password") or ''
 
+        # Refused before any hashing, so guessing costs the server nothing
+        wait = login_throttle.retry_after(request.remote_addr, email)
+        if wait:
+            flash(f'Too many failed attempts. Please try again in {wait // 60 + 1} minutes.', category='error')
+            return render_template("login.html", user=current_user), 429, {'Retry-After': str(wait)}
+
+        # Unknown emails are checked against a dummy hash, so they take as
+        # long as a wrong password and get the same answer
         user = User.query.filter_by(email=email).first()
-        if user:
-            if user.is_verified == True:
-                if check_password_hash(user.password, password):
-                    flash('Logged in! Welcome back!', category='success')
-                    login_user(user, remember=True)
-                    return redirect(url_for('views.home'))
-                else:
-                    flash('Password is incorrect.', category='error')
-            else:
-                flash(' You need to verify your account by clicking the link in sent to your email address', category='error')
+        try:
+            valid = password_hasher.verify(user.password if user else None, password)
+        except Overloaded:
+            return busy("login.html")
+
+        if not valid:
+            login_throttle.failed(request.remote_addr, email)
+            flash('Email or password is incorrect.', category='error')
+        elif user.is_verified != True:
+            flash(' You need to verify your account by clicking the link in sent to your email address', category='error')
         else:
-            flash('Email does not exists.', category='error')
-        
-        
+            login_throttle.succeeded(request.remote_addr, email)
+            flash('Logged in! Welcome back!', category='success')
+            login_user(user, remember=True)
+            return redirect(url_for('views.home'))
 
     return render_template("login.html", user=current_user)
 
 @auth.route('/signup', methods=['GET', 'POST'])
 def signup():
-    UPLOAD_FOLDER = os.path.join('website', 'static', 'uploads')
-
     if request.method == 'POST':
         email = request.form.get("email")
         username = request.form.get("username")
@@ -60,23 +76,27 @@ def signup():
             flash('That Username is too small!', category='error')
         elif len(password1) < 6:
             flash('That Password is too small!', category='error')
+        elif len(password1) > MAX_PASSWORD_LENGTH:
+            flash('That Password is too long!', category='error')
         elif len(email) < 5:
             flash('Email is invalid!', category='error')
         else:
+            # Hashed before the picture is stored, so an overloaded hasher
+            # leaves nothing behind
+            try:
+                password_hash = password_hasher.hash(password1)
+            except Overloaded:
+                return busy("signup.html")
+
             f = request.files.get('file')  # profile picture
             filename = None
             if f and f.filename != '':
-                ext = os.path.splitext(f.filename)[1]
-                unique_filename = f"{uuid.uuid4().hex}{ext}"
-                save_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                f.save(save_path)
-                filename = unique_filename
+                filename = media_store.save(f)
 
             new_user = User(
                 email=email,
                 username=username,
-                password=generate_password_hash(password1, method='pbkdf2:sha256'),
+                password=password_hash,
                 profile_image=filename
             )
             verification_links = VerificationLinks(
@@ -86,7 +106,12 @@ def signup():
                 expiration_date = datetime.now() + timedelta(hours=2)
             )
             db.session.add(new_user)
+            if filename:
+                db.session.flush()
+                media_jobs.enqueue('avatar', new_user.id)
             db.session.commit()
+            media_jobs.media_worker.wake()
+            username_index.add(new_user.id, new_user.username)
             login_user(new_user, remember=True)
             flash('Account has been made! Please verify your email address to log in!')
             return redirect(url_for('auth.login'))
@@ -0,0 +1,438 @@
+from flask import current_app
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from itertools import accumulate
+from . import db
+from .models import (
+    User, Follow, Post, Comment, Art, ArtComment, Video, VideoComment, Like,
+    Notification, TimelineEntry
+)
+from .feed import POST_TYPES
+from .data_io import insert_rows, defer_constraints, rebuild_derived
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+# Every seeded account logs in with this password
+PASSWORD = "benchmark"
+
+# Seeded content is spread over this many days before BASE_DATE, so a run
+# with the same seed and scale always produces the same rows
+BASE_DATE = datetime(2025, 1, 1)
+SPREAD_DAYS = 90
+
+# Rows created per seeded user. --users 200 gives about 12k rows, --users
+# 17000 about 1M (plus the timelines fanned out from them).
+PER_USER = {
+    'follows': 20,
+    'posts': 5,
+    'art': 1,
+    'videos': 0.5,
+    'likes': 15,
+    'comments': 5,
+    'notifications': 10,
+}
+
+WORDS = (
+    "sunset ocean portrait sketch city night forest river music street "
+    "light shadow colour paint film dance mountain rain coffee morning "
+    "winter summer garden market bridge train window story dream studio"
+).split()
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+# =========================
+# SYNTHETIC DATA
+# =========================
+
+class Seeder:
+    """Generates a social graph with a long tail: a few accounts get most of
+    the follows and likes, the way real ones do.
+    """
+
+    def __init__(self, users, seed=42):
+        self.users = users
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.first_user = next_id(User)
+        self.user_ids = range(self.first_user, self.first_user + users)
+        # Zipf-like popularity: the n-th account is picked with weight 1/n
+        self._popularity = list(accumulate(1 / rank for rank in range(1, users + 1)))
+
+    def _date(self):
+        return BASE_DATE - timedelta(seconds=self.rng.randrange(SPREAD_DAYS * 86400))
+
+    def _text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def _popular_user(self):
+        return self.rng.choices(self.user_ids, cum_weights=self._popularity)[0]
+
+    def _scaled(self, name):
+        return int(self.users * PER_USER[name])
+
+    def run(self):
+        # One transaction; every id is assigned here, so the checks can wait
+        defer_constraints()
+        password = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+        self.counts['users'] = insert_rows(User.__table__, (
+            {
+                'id': user_id,
+                'email': f"user{user_id}@bench.newland",
+                'username': f"user{user_id}",
+                'password': password,
+                'is_verified': True,
+                'date_created': self._date(),
+            }
+            for user_id in self.user_ids
+        ))
+
+        self._follows()
+        items = {
+            'post': self._items(Post, 'posts', lambda: {'text': self._text(12)}),
+            'art': self._items(Art, 'art', lambda: {'title': self._text(3), 'art': 'bench.png'}),
+            'video': self._items(Video, 'videos', lambda: {'title': self._text(3), 'video': 'bench.mp4', 'views': 0}),
+        }
+        likes = self._likes(items)
+
+        # Items go in after the likes so their like_count is already right
+        for model, name in ((Post, 'posts'), (Art, 'art'), (Video, 'videos')):
+            self.counts[name] = insert_rows(model.__table__, items[POST_TYPES[model]])
+        self.counts['likes'] = insert_rows(Like.__table__, likes)
+
+        self._comments(items)
+        self._notifications(items)
+        self._timelines()
+        db.session.commit()
+
+        rebuild_derived()
+        return self.counts
+
+    def _follows(self):
+        per_user = min(PER_USER['follows'], self.users - 1)
+        rows = []
+        for follower_id in self.user_ids:
+            followed = set()
+            while len(followed) < per_user:
+                user_id = self._popular_user()
+                if user_id != follower_id:
+                    followed.add(user_id)
+            rows += [{'follower_id': follower_id, 'followed_id': user_id} for user_id in followed]
+        self.counts['follows'] = insert_rows(Follow.__table__, rows)
+
+    def _items(self, model, name, fields):
+        first = next_id(model)
+        return [
+            {
+                'id': first + n,
+                'user_id': self.rng.choice(self.user_ids),
+                'date_created': self._date(),
+                'like_count': 0,
+                **fields(),
+            }
+            for n in range(self._scaled(name))
+        ]
+
+    def _likes(self, items):
+        likeable = [(post_type, row) for post_type, rows in items.items() for row in rows]
+        if not likeable:
+            return []
+        # Popular authors' items collect most of the likes
+        by_author = defaultdict(list)
+        for pair in likeable:
+            by_author[pair[1]['user_id']].append(pair)
+
+        seen = set()
+        rows = []
+        for _ in range(self._scaled('likes')):
+            author_items = by_author.get(self._popular_user())
+            post_type, item = self.rng.choice(author_items or likeable)
+            user_id = self.rng.choice(self.user_ids)
+            key = (user_id, item['id'], post_type)
+            if key in seen:
+                continue
+            seen.add(key)
+            item['like_count'] += 1
+            rows.append({
+                'user_id': user_id,
+                'post_id': item['id'],
+                'post_type': post_type,
+                'date_created': self._date(),
+            })
+        return rows
+
+    def _comments(self, items):
+        targets = {
+            'post': (Comment, 'post_id'),
+            'art': (ArtComment, 'art_id'),
+            'video': (VideoComment, 'video_id'),
+        }
+        rows = defaultdict(list)
+        kinds = [kind for kind in targets if items[kind]]
+        for _ in range(self._scaled('comments') if kinds else 0):
+            kind = self.rng.choice(kinds)
+            model, column = targets[kind]
+            rows[model].append({
+                'text': self._text(6),
+                'user_id': self.rng.choice(self.user_ids),
+                column: self.rng.choice(items[kind])['id'],
+                'date_created': self._date(),
+            })
+        self.counts['comments'] = sum(insert_rows(model.__table__, r) for model, r in rows.items())
+
+    def _notifications(self, items):
+        first = next_id(Notification)
+        unread = Counter()
+        rows = []
+        for _ in range(self._scaled('notifications')):
+            type = self.rng.choice(('follow', 'like', 'comment'))
+            row = {
+                'user_id': self._popular_user(),
+                'from_user_id': self.rng.choice(self.user_ids),
+                'type': type,
+                'is_read': self.rng.random() < 0.7,
+                'date_created': self._date(),
+                'actor_count': 1,
+                # Every row has every key: they go in as one executemany
+                'object_type': None,
+                'object_id': None,
+            }
+            if type != 'follow':
+                kind = self.rng.choice([kind for kind in items if items[kind]] or ['post'])
+                if items[kind]:
+                    row['object_type'] = kind
+                    row['object_id'] = self.rng.choice(items[kind])['id']
+            if not row['is_read']:
+                unread[row['user_id']] += 1
+            rows.append(row)
+        self.counts['notifications'] = insert_rows(Notification.__table__, rows)
+        # Each like/follow row has its one actor, as notifier.notify records
+        db.session.execute(text(
+            "INSERT INTO notification_actor (notification_id, user_id) "
+            "SELECT id, from_user_id FROM notification "
+            "WHERE id >= :first AND type IN ('like', 'follow')"
+        ), {'first': first})
+
+        for user_id, count in unread.items():
+            User.query.filter_by(id=user_id).update(
+                {User.unread_notifications: User.unread_notifications + count}
+            )
+
+    def _timelines(self):
+        # What fan-out on write would have produced, in one INSERT ... SELECT
+        # per content type
+        before = db.session.query(func.count(TimelineEntry.id)).scalar()
+        for object_type, model in (('post', Post), ('art', Art), ('video', Video)):
+            table = model.__table__.name
+            db.session.execute(text(
+                f"INSERT OR IGNORE INTO timeline_entry "
+                f"(user_id, author_id, object_type, object_id, date_created) "
+                f"SELECT follow.follower_id, item.user_id, :object_type, item.id, item.date_created "
+                f"FROM follow JOIN {table} AS item ON item.user_id = follow.followed_id "
+                f"WHERE follow.follower_id >= :first"
+            ), {'object_type': object_type, 'first': self.first_user})
+        self.counts['timeline entries'] = db.session.query(func.count(TimelineEntry.id)).scalar() - before
+
+
+def seed(users, seed=42):
+    """Add ``users`` synthetic accounts and their content; returns row counts."""
+    return Seeder(users, seed).run()
+
+# =========================
+# SCENARIOS
+# =========================
+
+# Each scenario turns a random generator and the seeded id ranges into a
+# (method, path) to request; "like_post" toggles, so likes come and go
+
+def _scenarios():
+    return {
+        'home': lambda rng, ids: ('GET', '/home'),
+        'feed': lambda rng, ids: ('GET', '/feed'),
+        'profile': lambda rng, ids: ('GET', f"/profile/{rng.choice(ids['user'])}"),
+        'media': lambda rng, ids: ('GET', '/media'),
+        'search': lambda rng, ids: ('GET', f"/search?q={rng.choice(WORDS)}"),
+        'like_post': lambda rng, ids: ('GET', f"/like/post/{rng.choice(ids['post'])}"),
+        'notifications': lambda rng, ids: ('GET', '/notifications'),
+        'increment_views': lambda rng, ids: ('GET', f"/video_api/increment_views/{rng.choice(ids['video'])}"),
+    }
+
+
+SCENARIOS = tuple(_scenarios())
+
+
+def _id_ranges():
+    ranges = {}
+    for name, model in (('user', User), ('post', Post), ('video', Video)):
+        low, high = db.session.query(func.min(model.id), func.max(model.id)).one()
+        if low is None:
+            raise RuntimeError(f"No {name} rows to benchmark against; run 'flask bench seed' first")
+        ranges[name] = range(low, high + 1)
+    return ranges
+
+
+class TestClientTarget:
+    """Runs requests in-process through the app's test client."""
+
+    def __init__(self, app, user_id):
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    def request(self, method, path):
+        response = self.client.open(path, method=method, headers={'Referer': '/home'})
+        return response.status_code, response.headers.get('X-Query-Count')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTarget:
+    """Runs requests against a running server, logged in as a seeded user.
+
+    Query counts are only reported if the server runs with QUERY_PROFILER.
+    """
+
+    def __init__(self, base_url, user_id):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+        form = urllib.parse.urlencode({
+            'email': f"user{user_id}@bench.newland",
+            'password': PASSWORD,
+        }).encode()
+        # A successful login redirects to the home page
+        status, _ = self.request('POST', '/login', form)
+        if status != 302:
+            raise RuntimeError(f"Could not log in as user{user_id} on {self.base_url}")
+
+    def request(self, method, path, data=None):
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Referer': self.base_url + '/home'}
+        )
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status, response.headers.get('X-Query-Count')
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('X-Query-Count')
+
+# =========================
+# RUNNING
+# =========================
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, round(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _worker(make_target, scenario, ids, requests, warmup, seed):
+    rng = random.Random(seed)
+    target = make_target(rng.choice(ids['user']))
+    build = _scenarios()[scenario]
+    latencies = []
+    queries = []
+    errors = 0
+    for n in range(warmup + requests):
+        method, path = build(rng, ids)
+        started = time.perf_counter()
+        status, query_count = target.request(method, path)
+        elapsed = time.perf_counter() - started
+        if n < warmup:
+            continue
+        latencies.append(elapsed)
+        if status >= 400:
+            errors += 1
+        if query_count is not None:
+            queries.append(int(query_count))
+    return latencies, queries, errors
+
+
+def run(scenarios=SCENARIOS, requests=200, warmup=20, concurrency=1, base_url=None, seed=42):
+    """Run each scenario and return ``{scenario: stats}``.
+
+    Latencies are in milliseconds; ``rps`` is completed requests per second
+    of wall time across all ``concurrency`` clients.
+    """
+    app = current_app._get_current_object()
+    ids = _id_ranges()
+    if base_url:
+        make_target = lambda user_id: HttpTarget(base_url, user_id)
+    else:
+        # Counted by the profiler; its panel would only skew the timings
+        app.config.update(QUERY_PROFILER=True, QUERY_PROFILER_PANEL=False)
+        make_target = lambda user_id: TestClientTarget(app, user_id)
+
+    per_client = max(1, requests // concurrency)
+    results = {}
+    for scenario in scenarios:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            runs = list(pool.map(
+                lambda n: _worker(make_target, scenario, ids, per_client, warmup, seed + n),
+                range(concurrency)
+            ))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(l * 1000 for run_latencies, _, _ in runs for l in run_latencies)
+        queries = [q for _, run_queries, _ in runs for q in run_queries]
+        results[scenario] = {
+            'requests': len(latencies),
+            'errors': sum(errors for _, _, errors in runs),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'rps': round(len(latencies) / wall, 1),
+            'avg_queries': round(sum(queries) / len(queries), 1) if queries else None,
+        }
+    return results
+
+# =========================
+# COMPARING RUNS
+# =========================
+
+def compare(results, baseline, tolerance=0.10):
+    """Return ``(scenario, metric, before, after)`` for each regression.
+
+    p95 latency may grow by ``tolerance``; any extra query counts.
+    """
+    regressions = []
+    for scenario, stats in results.items():
+        before = baseline.get(scenario)
+        if not before:
+            continue
+        if before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((scenario, 'p95_ms', before['p95_ms'], stats['p95_ms']))
+        if before.get('avg_queries') is not None and stats['avg_queries'] is not None \
+                and stats['avg_queries'] > before['avg_queries']:
+            regressions.append((scenario, 'avg_queries', before['avg_queries'], stats['avg_queries']))
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_results(path, results, **meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
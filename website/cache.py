@@ -0,0 +1,383 @@
+from flask import Blueprint, current_app, jsonify, abort
+from flask_login import login_required
+from sqlalchemy import event, select, inspect
+from sqlalchemy.orm import Session
+from abc import ABC, abstractmethod
+from collections import OrderedDict, Counter
+from . import db
+from .routing import reads_from_replica
+from .models import (
+    User, Post, Comment, Art, ArtComment, Video, VideoComment, Like, Follow
+)
+import pickle
+import threading
+import time
+
+
+cache_stats = Blueprint("cache_stats", __name__)
+
+
+# =========================
+# BACKENDS
+# =========================
+
+class CacheBackend(ABC):
+    """What QueryCache needs from a store.
+
+    Values are bytes (pickled), so anything that can hold bytes under string
+    keys with an expiry and an atomic counter will do.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """The bytes stored under ``key``, or None."""
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store ``value`` under ``key``, for ``ttl`` seconds if given."""
+
+    @abstractmethod
+    def incr(self, key):
+        """Add one to an integer counter (missing counts as 0); return it."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry."""
+
+    def __len__(self):
+        return 0
+
+
+class LRUBackend(CacheBackend):
+    """In-process store: least recently used entries go first once full."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            _, value = self._data.get(key, (None, 0))
+            value += 1
+            # Counters never expire, or a version could go back to an old one
+            self._data[key] = (None, value)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend(CacheBackend):
+    """Store shared by every worker, so a bump in one invalidates them all.
+
+    Needs the ``redis`` package. Keys are namespaced with ``prefix`` so
+    clear() only drops this app's entries.
+    """
+
+    def __init__(self, client, prefix="newland:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        # Counters come back as their decimal bytes
+        return [int(v) if key.startswith("v:") and v is not None else v for key, v in zip(keys, values)]
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*", count=1000):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+
+# =========================
+# QUERY CACHE
+# =========================
+
+class QueryCache:
+    """Caches query results under per-entity keys, invalidated by tags.
+
+    Each entry stores the versions of its tags when it was loaded; bumping a
+    tag (done after every commit touching it, see below) makes every entry
+    carrying it a miss. Values are pickled, so a hit hands out fresh copies
+    and ORM instances come back detached; attach() puts them in the session.
+    """
+
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or LRUBackend()
+        self.ttl = ttl
+        self.enabled = True
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND')
+        if backend is not None:
+            self.backend = backend
+        elif app.config.get('CACHE_REDIS_URL'):
+            self.backend = RedisBackend.from_url(app.config['CACHE_REDIS_URL'])
+        elif 'CACHE_MAX_ENTRIES' in app.config:
+            self.backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'])
+        self.ttl = app.config.get('CACHE_TTL', self.ttl)
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+
+    def _count(self, what, key):
+        namespace = key.split(':', 1)[0]
+        with self._stats_lock:
+            self.stats[what] += 1
+            self.stats[f"{what}:{namespace}"] += 1
+
+    def versions(self, tags):
+        return tuple(v or 0 for v in self.backend.get_many([f"v:{tag}" for tag in tags]))
+
+    def bump(self, tags):
+        for tag in tags:
+            self.backend.incr(f"v:{tag}")
+        with self._stats_lock:
+            self.stats['invalidations'] += len(tags)
+
+    def get_or_load(self, key, tags, loader, ttl=None):
+        if not self.enabled:
+            return loader()
+
+        # Versions are read before loading, so a change committed while the
+        # loader runs leaves this entry already stale rather than hiding it
+        versions = self.versions(tags)
+        raw = self.backend.get(key)
+        if raw is not None:
+            stored_versions, value = pickle.loads(raw)
+            if stored_versions == versions:
+                self._count('hits', key)
+                return value
+
+        self._count('misses', key)
+        value = loader()
+        # A lagging replica can return rows older than the tag versions just
+        # read, so only what the primary loaded is stored for everyone else
+        if not reads_from_replica(db.session):
+            self.backend.set(key, pickle.dumps((versions, value)), ttl or self.ttl)
+        return value
+
+    def attach(self, instances):
+        # load=False: copy the cached state in without querying the database
+        return [db.session.merge(obj, load=False) for obj in instances]
+
+    def report(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_ratio'] = round(stats.get('hits', 0) / lookups, 3) if lookups else None
+        stats['entries'] = len(self.backend)
+        return stats
+
+
+query_cache = QueryCache()
+
+# =========================
+# INVALIDATION
+# =========================
+
+# Tags in use:
+#   user:<id>       a user's profile pages (their items and what's on them)
+#   author:<id>     just the user's own row (name, avatar) shown on their cards
+#   account:<id>    the logged-in user's row, see load_user() below
+#   post:<id>, art:<id>, video:<id>   one item: detail pages and card fragments
+#   gallery:art, gallery:video media page listings
+#   users           the /users list
+
+OWNED = {'post': Post, 'art': Art, 'video': Video}
+
+
+def _owner(connection, kind, object_id):
+    model = OWNED[kind]
+    return connection.execute(select(model.user_id).where(model.id == object_id)).scalar()
+
+
+def tags_for(connection, obj):
+    if isinstance(obj, User):
+        return {
+            f"user:{obj.id}", f"author:{obj.id}", f"account:{obj.id}",
+            "users", "gallery:art", "gallery:video"
+        }
+    if isinstance(obj, Post):
+        return {f"user:{obj.user_id}", f"post:{obj.id}"}
+    if isinstance(obj, (Art, Video)):
+        kind = 'art' if isinstance(obj, Art) else 'video'
+        return {f"user:{obj.user_id}", f"{kind}:{obj.id}", f"gallery:{kind}"}
+    if isinstance(obj, Comment):
+        return {f"user:{_owner(connection, 'post', obj.post_id)}", f"post:{obj.post_id}"}
+    if isinstance(obj, ArtComment):
+        return {f"user:{_owner(connection, 'art', obj.art_id)}", f"art:{obj.art_id}", "gallery:art"}
+    if isinstance(obj, VideoComment):
+        return {f"user:{_owner(connection, 'video', obj.video_id)}", f"video:{obj.video_id}", "gallery:video"}
+    if isinstance(obj, Like):
+        tags = {
+            f"user:{_owner(connection, obj.post_type, obj.post_id)}",
+            f"{obj.post_type}:{obj.post_id}"
+        }
+        if obj.post_type in ('art', 'video'):
+            tags.add(f"gallery:{obj.post_type}")
+        return tags
+    if isinstance(obj, Follow):
+        return {f"user:{obj.follower_id}", f"user:{obj.followed_id}"}
+    return set()
+
+
+CACHED_MODELS = (User, Post, Comment, Art, ArtComment, Video, VideoComment, Like, Follow)
+
+# Cards and detail pages show each commenter's name and avatar, so renaming
+# or deleting a user also invalidates every item they commented on
+COMMENTS = {'post': (Comment, Comment.post_id), 'art': (ArtComment, ArtComment.art_id),
+            'video': (VideoComment, VideoComment.video_id)}
+SHOWN_USER_FIELDS = ('username', 'profile_image', 'profile_thumb')
+
+
+def commented_tags(connection, user_id):
+    tags = set()
+    for kind, (comment, parent_id) in COMMENTS.items():
+        model = OWNED[kind]
+        rows = connection.execute(
+            select(model.id, model.user_id).distinct()
+            .join(comment, parent_id == model.id)
+            .where(comment.user_id == user_id)
+        )
+        for item_id, owner_id in rows:
+            tags |= {f"{kind}:{item_id}", f"user:{owner_id}"}
+    return tags
+
+
+@event.listens_for(Session, 'before_flush')
+def collect_commenter_tags(session, flush_context, instances):
+    # Before the flush, while a deleted user's comments are still there
+    users = [obj for obj in session.deleted if isinstance(obj, User)] + [
+        obj for obj in session.dirty if isinstance(obj, User)
+        and any(inspect(obj).attrs[field].history.has_changes() for field in SHOWN_USER_FIELDS)
+    ]
+    if not users:
+        return
+
+    connection = session.connection()
+    tags = session.info.setdefault('cache_tags', set())
+    for user in users:
+        tags |= commented_tags(connection, user.id)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_cache_tags(session, flush_context):
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, CACHED_MODELS)
+        and (obj not in session.dirty or session.is_modified(obj))
+    ]
+    if not changed:
+        return
+
+    connection = session.connection()
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in changed:
+        tags |= tags_for(connection, obj)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_cache_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        query_cache.bump(tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
+
+
+def tag_changes(*tags):
+    """Invalidate ``tags`` when the session commits.
+
+    For bulk UPDATEs, which change rows without the ORM seeing them.
+    """
+    db.session.info.setdefault('cache_tags', set()).update(tags)
+
+# =========================
+# USER SNAPSHOTS
+# =========================
+
+# A snapshot can outlive a change by this long in other worker processes
+# (with the in-process backend, bumps only reach the worker that committed;
+# RedisBackend shares them)
+USER_TTL = 30
+
+
+def load_user(user_id):
+    """The login manager's user loader: the User row, usually from cache.
+
+    Any committed change to the row (profile edits, verification, deletion,
+    unread count) bumps account:<id>, so this worker never serves a stale
+    snapshot; USER_CACHE_TTL bounds it everywhere else.
+    """
+    user = query_cache.get_or_load(
+        f"account:{user_id}",
+        [f"account:{user_id}"],
+        lambda: db.session.get(User, user_id),
+        ttl=current_app.config.get('USER_CACHE_TTL', USER_TTL)
+    )
+    if user is None:
+        return None
+    return query_cache.attach([user])[0]
+
+# =========================
+# CACHE STATS ROUTE
+# =========================
+
+@cache_stats.route('/debug/cache')
+@login_required
+def cache_report():
+    # Keys and hit rates say what people look at; not for everyone to see
+    if not current_app.config.get('CACHE_STATS', current_app.debug):
+        abort(404)
+    return jsonify(query_cache.report())
@@ -0,0 +1,368 @@
+import click
+import os
+import time
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, func
+from . import db
+from .models import User, Follow, Post, Art, Video, Like, TimelineEntry, Notification, Upload
+from . import timeline
+from . import follow_graph
+from .uploads import partial_path
+from . import media_jobs
+from . import media_store
+from . import search_index
+from . import query_plans
+from . import bench as benchmarks
+from . import data_io
+
+
+# =========================
+# COUNTERS
+# =========================
+
+@click.command('reconcile-likes')
+@with_appcontext
+def reconcile_likes():
+    """Rebuild the like_count columns from the likes table."""
+    for post_type, model in (('post', Post), ('art', Art), ('video', Video)):
+        actual = select(func.count(Like.id)).where(
+            Like.post_id == model.id,
+            Like.post_type == post_type
+        ).scalar_subquery()
+
+        result = db.session.execute(
+            update(model)
+            .where(model.like_count != actual)
+            .values(like_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        click.echo(f"{post_type}: fixed {result.rowcount} like counters")
+
+    db.session.commit()
+
+
+@click.command('reconcile-notifications')
+@with_appcontext
+def reconcile_notifications():
+    """Rebuild the unread_notifications counters from the notification rows."""
+    actual = select(func.count(Notification.id)).where(
+        Notification.user_id == User.id,
+        Notification.is_read == False
+    ).scalar_subquery()
+
+    result = db.session.execute(
+        update(User)
+        .where(User.unread_notifications != actual)
+        .values(unread_notifications=actual)
+        .execution_options(synchronize_session=False)
+    )
+    click.echo(f"fixed {result.rowcount} unread counters")
+    db.session.commit()
+
+
+@click.command('reconcile-follows')
+@with_appcontext
+def reconcile_follows():
+    """Rebuild the follower and following counts from the follow table."""
+    fixed = follow_graph.recount()
+    db.session.commit()
+    click.echo(f"fixed {fixed} follow counters")
+
+
+# =========================
+# TIMELINES
+# =========================
+
+@click.command('backfill-timelines')
+@with_appcontext
+def backfill_timelines():
+    """Fill every timeline from the follow graph (for existing data)."""
+    for (user_id,) in db.session.query(User.id):
+        timeline.backfill(user_id, user_id)
+    db.session.commit()
+
+    for count, follow in enumerate(Follow.query.yield_per(1000), start=1):
+        timeline.backfill(follow.follower_id, follow.followed_id)
+        if count % 1000 == 0:
+            db.session.commit()
+    db.session.commit()
+    click.echo("Timelines backfilled")
+
+
+@click.command('trim-timelines')
+@with_appcontext
+def trim_timelines():
+    """Drop timeline entries beyond TIMELINE_CAP for every reader."""
+    over_cap = db.session.query(TimelineEntry.user_id)\
+        .group_by(TimelineEntry.user_id)\
+        .having(func.count(TimelineEntry.id) > timeline.TIMELINE_CAP)\
+        .all()
+    for (user_id,) in over_cap:
+        timeline.trim(user_id)
+    db.session.commit()
+    click.echo(f"Trimmed {len(over_cap)} timelines")
+
+
+# =========================
+# NOTIFICATIONS
+# =========================
+
+@click.command('prune-notifications')
+@click.option('--days', default=90, show_default=True,
+              help='Delete read notifications older than this.')
+@with_appcontext
+def prune_notifications(days):
+    """Age out old read notifications."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = Notification.query.filter(
+        Notification.is_read == True,
+        Notification.date_created < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f"Deleted {deleted} read notifications older than {days} days")
+
+
+# =========================
+# UPLOADS
+# =========================
+
+@click.command('prune-uploads')
+@click.option('--hours', default=24, show_default=True,
+              help='Discard unfinished uploads started longer ago than this.')
+@with_appcontext
+def prune_uploads(hours):
+    """Delete abandoned chunked uploads and their partial files."""
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    stale = Upload.query.filter(Upload.date_created < cutoff).all()
+    for upload in stale:
+        path = partial_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(upload)
+    db.session.commit()
+    click.echo(f"Discarded {len(stale)} abandoned uploads")
+
+
+# =========================
+# MEDIA PROCESSING
+# =========================
+
+@click.command('process-media')
+@click.option('--backfill', is_flag=True,
+              help='First queue jobs for art, videos and avatars never processed.')
+@with_appcontext
+def process_media(backfill):
+    """Run queued thumbnail/poster jobs in the foreground."""
+    if backfill:
+        for (art_id,) in db.session.query(Art.id).filter(Art.thumbnail == None):
+            media_jobs.enqueue('art', art_id)
+        for (video_id,) in db.session.query(Video.id).filter(Video.poster == None):
+            media_jobs.enqueue('video', video_id)
+        for (user_id,) in db.session.query(User.id).filter(
+                User.profile_image != None, User.profile_thumb == None):
+            media_jobs.enqueue('avatar', user_id)
+        db.session.commit()
+
+    done = media_jobs.drain()
+    click.echo(f"Ran {done} media jobs")
+
+
+@click.command('gc-media')
+@click.option('--hours', default=24, show_default=True,
+              help='Only reclaim blobs unreferenced for longer than this.')
+@with_appcontext
+def gc_media(hours):
+    """Delete stored media files nothing refers to any more."""
+    removed, reclaimed = media_store.collect_garbage(timedelta(hours=hours))
+    click.echo(f"Removed {removed} files, reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+
+
+# =========================
+# SEARCH
+# =========================
+
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search():
+    """Rebuild the full-text search index from existing rows."""
+    count = search_index.rebuild()
+    click.echo(f"Indexed {count} users, posts, art and videos")
+
+
+# =========================
+# QUERY PLANS
+# =========================
+
+@click.command('check-query-plans')
+@click.option('--verbose', is_flag=True, help='Print every plan, not just failures.')
+@with_appcontext
+def check_query_plans(verbose):
+    """Fail if a hot query would scan a table or sort without an index.
+
+    Run against a database migrated to head, e.g. in CI after
+    'flask db upgrade'.
+    """
+    failed = 0
+    for name, (plan, problems) in query_plans.check_plans().items():
+        if problems:
+            failed += 1
+            click.echo(f"FAIL {name}")
+        elif verbose:
+            click.echo(f"ok   {name}")
+        if problems or verbose:
+            for step in plan:
+                click.echo(f"       {step}")
+
+    if failed:
+        raise click.ClickException(f"{failed} hot queries are not using an index")
+    click.echo("All hot queries use an index")
+
+
+# =========================
+# BENCHMARKS
+# =========================
+
+@click.group('bench')
+def bench():
+    """Seed synthetic data and time the hot routes.
+
+    Point NEWLAND_DATABASE_URI at a scratch database first.
+    """
+
+
+@bench.command('seed')
+@click.option('--users', default=200, show_default=True,
+              help='Accounts to create; content scales with it (200 is about 12k rows).')
+@click.option('--seed', 'random_seed', default=42, show_default=True)
+@with_appcontext
+def bench_seed(users, random_seed):
+    """Fill the database with a reproducible synthetic social graph."""
+    db.create_all()
+    started = time.perf_counter()
+    counts = benchmarks.seed(users, random_seed)
+    for name, count in counts.items():
+        click.echo(f"{name:>18}: {count}")
+    click.echo(f"Seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s")
+
+
+@bench.command('run')
+@click.option('--scenario', 'scenarios', multiple=True,
+              type=click.Choice(benchmarks.SCENARIOS),
+              help='Only run these (repeatable). Default: all.')
+@click.option('--requests', default=200, show_default=True, help='Timed requests per scenario.')
+@click.option('--warmup', default=20, show_default=True, help='Untimed requests per client first.')
+@click.option('--concurrency', default=1, show_default=True, help='Clients running at once.')
+@click.option('--url', default=None, help='Benchmark a running server instead of the test client.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Save the results as JSON.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Results JSON to compare against; exits non-zero on regressions.')
+@click.option('--tolerance', default=0.10, show_default=True,
+              help='Allowed p95 growth over the baseline, as a fraction.')
+@click.option('--seed', 'random_seed', default=42, show_default=True)
+@with_appcontext
+def bench_run(scenarios, requests, warmup, concurrency, url, output, baseline, tolerance, random_seed):
+    """Time the hot routes: p50/p95/p99 latency, throughput and queries."""
+    results = benchmarks.run(
+        scenarios or benchmarks.SCENARIOS, requests, warmup, concurrency, url, random_seed
+    )
+
+    click.echo(f"{'scenario':<16}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}{'queries':>9}")
+    for scenario, stats in results.items():
+        click.echo(
+            f"{scenario:<16}{stats['requests']:>6}{stats['errors']:>5}"
+            f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+            f"{stats['rps']:>8}{stats['avg_queries'] if stats['avg_queries'] is not None else '-':>9}"
+        )
+
+    if output:
+        benchmarks.save_results(
+            output, results,
+            date=datetime.utcnow().isoformat(), url=url, concurrency=concurrency,
+            database=db.engine.url.render_as_string(hide_password=True)
+        )
+        click.echo(f"Saved to {output}")
+
+    if baseline:
+        regressions = benchmarks.compare(results, benchmarks.load_results(baseline), tolerance)
+        for scenario, metric, before, after in regressions:
+            click.echo(f"REGRESSION {scenario} {metric}: {before} -> {after}")
+        if regressions:
+            raise click.ClickException(f"{len(regressions)} regressions against {baseline}")
+        click.echo(f"No regressions against {baseline}")
+
+
+# =========================
+# IMPORT / EXPORT
+# =========================
+
+@click.group('data')
+def data():
+    """Move whole tables in and out as NDJSON or CSV files.
+
+    For synthetic data to import or test with, see 'flask bench seed'.
+    """
+
+
+def _data_files(folder, format, tables):
+    for name in tables or data_io.TABLES:
+        yield name, os.path.join(folder, f"{name}.{format}")
+
+
+@data.command('export')
+@click.argument('folder', type=click.Path(file_okay=False))
+@click.option('--format', 'format', type=click.Choice(data_io.FORMATS), default='ndjson', show_default=True)
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(data_io.TABLES)),
+              help='Only these tables (repeatable). Default: all.')
+@with_appcontext
+def data_export(folder, format, tables):
+    """Write each table to FOLDER/<table>.<format>."""
+    os.makedirs(folder, exist_ok=True)
+    for name, path in _data_files(folder, format, tables):
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            count = data_io.export_table(name, stream, format)
+        click.echo(f"{name}: {count} rows -> {path}")
+
+
+@data.command('import')
+@click.argument('folder', type=click.Path(exists=True, file_okay=False))
+@click.option('--format', 'format', type=click.Choice(data_io.FORMATS), default='ndjson', show_default=True)
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(data_io.TABLES)),
+              help='Only these tables (repeatable). Default: every file found.')
+@click.option('--commit-every', default=data_io.COMMIT_EVERY, show_default=True,
+              help='Rows per transaction.')
+@with_appcontext
+def data_import(folder, format, tables, commit_every):
+    """Load FOLDER/<table>.<format> files written by 'flask data export'.
+
+    Ids are kept, so load into an empty database, e.g. right after
+    'flask db upgrade'.
+    """
+    started = time.perf_counter()
+    total = 0
+    for name, path in _data_files(folder, format, tables):
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as stream:
+            count = data_io.import_table(name, stream, format, commit_every)
+        click.echo(f"{name}: {count} rows <- {path}")
+        total += count
+
+    data_io.rebuild_derived()
+    click.echo(f"Imported {total} rows in {time.perf_counter() - started:.1f}s")
+
+
+def init_app(app):
+    app.cli.add_command(reconcile_likes)
+    app.cli.add_command(reconcile_follows)
+    app.cli.add_command(reconcile_notifications)
+    app.cli.add_command(backfill_timelines)
+    app.cli.add_command(trim_timelines)
+    app.cli.add_command(prune_notifications)
+    app.cli.add_command(prune_uploads)
+    app.cli.add_command(process_media)
+    app.cli.add_command(gc_media)
+    app.cli.add_command(rebuild_search)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(bench)
+    app.cli.add_command(data)
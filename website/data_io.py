@@ -0,0 +1,168 @@
+from sqlalchemy import insert, select, text
+from datetime import datetime
+from . import db
+from .models import (
+    User, Follow, Post, Comment, Art, ArtComment, Video, VideoComment, Like,
+    Notification, NotificationActor, TimelineEntry
+)
+from . import search_index
+from . import follow_graph
+from .cache import query_cache
+import csv
+import json
+
+
+# Exported and imported in this order, parents before children. Media jobs,
+# uploads and blobs describe files on one server's disk and aren't included.
+MODELS = (
+    User, Follow, Post, Comment, Art, ArtComment, Video, VideoComment, Like,
+    Notification, NotificationActor, TimelineEntry
+)
+TABLES = {model.__table__.name: model.__table__ for model in MODELS}
+
+FORMATS = ('ndjson', 'csv')
+
+# Rows sent to the database per executemany
+CHUNK_SIZE = 5000
+
+# Rows per transaction on import; foreign keys are checked at each commit
+COMMIT_EVERY = 200_000
+
+# How a CSV cell spells NULL, as in COPY, so it can't be mistaken for ''
+CSV_NULL = '\\N'
+
+
+# =========================
+# BULK INSERTS
+# =========================
+
+def defer_constraints():
+    """Check foreign keys at commit instead of row by row.
+
+    SQLite resets this at the end of every transaction, so call it again
+    after each commit.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text("PRAGMA defer_foreign_keys = ON"))
+    elif db.engine.dialect.name == 'postgresql':
+        db.session.execute(text("SET CONSTRAINTS ALL DEFERRED"))
+
+
+def insert_rows(table, rows, chunk_size=CHUNK_SIZE, commit_every=None):
+    """Insert dicts with one executemany per chunk; returns the row count.
+
+    Goes straight to the table, so ORM events (search index, cache tags,
+    timeline fan-out) don't run: call rebuild_derived() afterwards. With
+    ``commit_every`` the rows are committed in transactions of that size,
+    otherwise committing is left to the caller.
+    """
+    statement = insert(table)
+    count = uncommitted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) < chunk_size:
+            continue
+        db.session.execute(statement, batch)
+        count += len(batch)
+        uncommitted += len(batch)
+        batch = []
+        if commit_every and uncommitted >= commit_every:
+            db.session.commit()
+            defer_constraints()
+            uncommitted = 0
+
+    if batch:
+        db.session.execute(statement, batch)
+        count += len(batch)
+    return count
+
+
+def rebuild_derived():
+    """Redo what ORM events normally keep up to date after a bulk load."""
+    search_index.rebuild()
+    # Exports made before the count columns existed load them as 0
+    follow_graph.recount()
+    db.session.commit()
+    query_cache.backend.clear()
+
+# =========================
+# EXPORT
+# =========================
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_table(name, stream, format='ndjson'):
+    """Write every row of table ``name`` to a text stream; returns the count.
+
+    Rows are fetched in batches through a server-side cursor, so memory use
+    stays flat however big the table is.
+    """
+    table = TABLES[name]
+    result = db.session.execute(
+        select(table).order_by(*table.primary_key.columns)
+        .execution_options(yield_per=CHUNK_SIZE)
+    )
+
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(table.columns.keys())
+        for row in result:
+            writer.writerow([CSV_NULL if v is None else _jsonable(v) for v in row])
+            count += 1
+    else:
+        for row in result.mappings():
+            stream.write(json.dumps({k: _jsonable(v) for k, v in row.items()}))
+            stream.write('\n')
+            count += 1
+    return count
+
+# =========================
+# IMPORT
+# =========================
+
+def _converter(column):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+
+    def convert(value, from_csv):
+        if value is None or (from_csv and value == CSV_NULL):
+            return None
+        if python_type is datetime:
+            return datetime.fromisoformat(value) if isinstance(value, str) else value
+        if python_type is bool:
+            return value.lower() in ('1', 'true', 't', 'yes') if isinstance(value, str) else bool(value)
+        if python_type is int:
+            return int(value)
+        return value
+
+    return convert
+
+
+def _read(table, stream, format):
+    converters = {column.key: _converter(column) for column in table.columns}
+    from_csv = format == 'csv'
+    records = csv.DictReader(stream) if from_csv else (json.loads(line) for line in stream if line.strip())
+    for record in records:
+        unknown = set(record) - set(converters)
+        if unknown:
+            raise ValueError(f"{table.name}: unknown columns {', '.join(sorted(unknown))}")
+        yield {key: converters[key](value, from_csv) for key, value in record.items()}
+
+
+def import_table(name, stream, format='ndjson', commit_every=COMMIT_EVERY):
+    """Load rows exported by export_table() into table ``name``.
+
+    Rows keep their ids, so import into an empty database (or one without
+    those ids). Returns the number of rows inserted.
+    """
+    table = TABLES[name]
+    defer_constraints()
+    count = insert_rows(table, _read(table, stream, format), commit_every=commit_every)
+    db.session.commit()
+    return count
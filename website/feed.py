@@ -0,0 +1,86 @@
+from sqlalchemy.orm import joinedload, selectinload
+from . import db
+from .models import Post, Comment, Art, ArtComment, Video, VideoComment, Like
+from .pagination import keyset_page
+from .cache import query_cache
+
+
+# =========================
+# CARD LOADER OPTIONS
+# =========================
+
+# Everything a card template touches is loaded up front: the author with the
+# item, then every comment together with its author in one extra SELECT.
+
+def card_options(model):
+    if model is Post:
+        return (
+            joinedload(Post.user),
+            selectinload(Post.comments).joinedload(Comment.user),
+        )
+    if model is Art:
+        return (
+            joinedload(Art.user),
+            selectinload(Art.comments).joinedload(ArtComment.user),
+        )
+    if model is Video:
+        return (
+            joinedload(Video.user),
+            selectinload(Video.comments).joinedload(VideoComment.user),
+        )
+    raise ValueError(f"No card options for {model!r}")
+
+
+POST_TYPES = {Post: 'post', Art: 'art', Video: 'video'}
+
+
+# =========================
+# LIKE STATE
+# =========================
+
+def load_like_state(items, post_type, viewer=None):
+    """Return the ids among ``items`` that ``viewer`` has liked.
+
+    Like counts come from the denormalized ``like_count`` column; this adds a
+    single lookup of the viewer's likes, whatever the number of items.
+    """
+    ids = [item.id for item in items]
+    if not ids or viewer is None or not viewer.is_authenticated:
+        return set()
+
+    return {
+        post_id for (post_id,) in db.session.query(Like.post_id).filter(
+            Like.user_id == viewer.id,
+            Like.post_type == post_type,
+            Like.post_id.in_(ids)
+        )
+    }
+
+
+# =========================
+# FEED PAGES
+# =========================
+
+def load_cards(query, model, cursor=None, viewer=None):
+    """Return ``(items, next_cursor, liked_ids)`` for one page of cards.
+
+    The number of queries is constant per page, independent of how many
+    items, comments or likes it contains.
+    """
+    items, next_cursor = keyset_page(query.options(*card_options(model)), model, cursor)
+    liked = load_like_state(items, POST_TYPES[model], viewer)
+    return items, next_cursor, liked
+
+
+def load_cached_cards(key, tags, query, model, cursor=None, viewer=None):
+    """Like load_cards, but the page itself comes from query_cache.
+
+    Only the viewer's like state is queried on a hit.
+    """
+    items, next_cursor = query_cache.get_or_load(
+        f"{key}:{cursor or ''}", tags,
+        lambda: keyset_page(query.options(*card_options(model)), model, cursor)
+    )
+    items = query_cache.attach(items)
+    liked = load_like_state(items, POST_TYPES[model], viewer)
+    return items, next_cursor, liked
@@ -0,0 +1,166 @@
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+from . import db
+from .models import User, Follow
+from .cache import tag_changes
+
+
+# Users shown per page of a followers/following list
+PAGE_SIZE = 50
+
+
+# =========================
+# FOLLOWING
+# =========================
+
+# Every Follow is added and removed through here, so User.follower_count and
+# User.following_count, which the profile reads, stay in step with the rows.
+# The row and both counts change in the caller's transaction, which commits
+# them together or not at all.
+
+def _bump_counts(follower_id, followed_id, delta):
+    User.query.filter_by(id=followed_id).update(
+        {User.follower_count: User.follower_count + delta}
+    )
+    User.query.filter_by(id=follower_id).update(
+        {User.following_count: User.following_count + delta}
+    )
+    tag_changes(f"account:{follower_id}", f"account:{followed_id}")
+
+
+def follow(follower_id, followed_id):
+    """Add the follow; returns False if it was already there."""
+    # unique_follow: already following, maybe from a double click
+    added = db.session.execute(
+        sqlite_insert(Follow)
+        .values(follower_id=follower_id, followed_id=followed_id)
+        .on_conflict_do_nothing()
+    ).rowcount
+    if added != 1:
+        return False
+    _bump_counts(follower_id, followed_id, 1)
+    tag_changes(f"user:{follower_id}", f"user:{followed_id}")
+    return True
+
+
+def unfollow(follower_id, followed_id):
+    """Remove the follow; returns False if there was none."""
+    deleted = Follow.query.filter_by(
+        follower_id=follower_id, followed_id=followed_id
+    ).delete(synchronize_session='fetch')
+    if not deleted:
+        return False
+    _bump_counts(follower_id, followed_id, -1)
+    tag_changes(f"user:{follower_id}", f"user:{followed_id}")
+    return True
+
+
+def forget(user_id):
+    """Take a user about to be deleted out of everyone else's counts.
+
+    Their Follow rows go with the account through the relationship cascade.
+    Other workers' snapshots of the touched accounts catch up within
+    cache.USER_TTL.
+    """
+    their_follows = select(Follow.followed_id).where(Follow.follower_id == user_id)
+    their_followers = select(Follow.follower_id).where(Follow.followed_id == user_id)
+    touched = set(db.session.scalars(their_follows)) | set(db.session.scalars(their_followers))
+
+    db.session.execute(
+        update(User).where(User.id.in_(their_follows))
+        .values(follower_count=User.follower_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(User).where(User.id.in_(their_followers))
+        .values(following_count=User.following_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    tag_changes(*(f"{tag}:{other_id}" for other_id in touched for tag in ("account", "user")))
+
+
+def recount():
+    """Rebuild both count columns from the follow table; returns rows fixed."""
+    followers = select(func.count(Follow.id)).where(Follow.followed_id == User.id).scalar_subquery()
+    following = select(func.count(Follow.id)).where(Follow.follower_id == User.id).scalar_subquery()
+    result = db.session.execute(
+        update(User)
+        .where((User.follower_count != followers) | (User.following_count != following))
+        .values(follower_count=followers, following_count=following)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+# =========================
+# MEMBERSHIP
+# =========================
+
+def is_following(follower_id, followed_id):
+    return db.session.query(
+        Follow.query.filter_by(follower_id=follower_id, followed_id=followed_id).exists()
+    ).scalar()
+
+
+def followed_among(follower_id, user_ids):
+    """The subset of ``user_ids`` that ``follower_id`` follows, in one query."""
+    user_ids = set(user_ids)
+    if not follower_id or not user_ids:
+        return set()
+    return {
+        followed_id for (followed_id,) in
+        db.session.query(Follow.followed_id).filter(
+            Follow.follower_id == follower_id,
+            Follow.followed_id.in_(user_ids)
+        )
+    }
+
+# =========================
+# LISTINGS
+# =========================
+
+# Newest follows first, paged by Follow.id. The single-column follower and
+# followed indexes keep each user's rows in id order, so a page never sorts.
+
+def _page(query, cursor, per_page):
+    query = query.order_by(Follow.id.desc())
+    try:
+        query = query.filter(Follow.id < int(cursor)) if cursor else query
+    except ValueError:
+        pass
+
+    follows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(follows) > per_page:
+        follows = follows[:per_page]
+        next_cursor = str(follows[-1].id)
+    return follows, next_cursor
+
+
+def followers_page(user_id, cursor=None, per_page=PAGE_SIZE):
+    """Return ``(users, next_cursor)`` for the accounts following ``user_id``."""
+    follows, next_cursor = _page(
+        Follow.query.filter_by(followed_id=user_id).options(joinedload(Follow.follower_user)),
+        cursor, per_page
+    )
+    return [f.follower_user for f in follows], next_cursor
+
+
+def following_page(user_id, cursor=None, per_page=PAGE_SIZE):
+    """Return ``(users, next_cursor)`` for the accounts ``user_id`` follows."""
+    follows, next_cursor = _page(
+        Follow.query.filter_by(follower_id=user_id).options(joinedload(Follow.followed_user)),
+        cursor, per_page
+    )
+    return [f.followed_user for f in follows], next_cursor
+
+# =========================
+# HIGH FAN-OUT ACCOUNTS
+# =========================
+
+def popular_user_ids(min_followers):
+    return {
+        user_id for (user_id,) in
+        db.session.query(User.id).filter(User.follower_count >= min_followers)
+    }
@@ -0,0 +1,27 @@
+from markupsafe import Markup
+from .cache import query_cache
+
+
+# Rendered card markup is shared by every viewer. Anything that depends on
+# who is looking is left out of it and patched in by the script in base.html:
+#   <span class="like-heart" data-like="post-5">   turns red when the page
+#       also renders <span hidden data-liked="post-5"> outside the fragment
+#   <... class="owner-only d-none" data-owners="3 7">   shown to users 3 and 7
+
+
+def cached_fragment(name, kind, item, caller):
+    """Cache the body of ``{% call cached_fragment(name, kind, item) %}``.
+
+    Keyed by the fragment name and item id, and stamped with the versions of
+    the item's, its author's and its commenters' cache tags, so a like,
+    comment, edit or commenter rename re-renders just that card. The
+    comments come loaded with the card (feed.card_options).
+    """
+    commenters = sorted({comment.user_id for comment in item.comments})
+    html = query_cache.get_or_load(
+        f"fragment:{name}:{item.id}",
+        [f"{kind}:{item.id}", f"author:{item.user_id}"]
+        + [f"author:{user_id}" for user_id in commenters],
+        lambda: str(caller())
+    )
+    return Markup(html)
@@ -0,0 +1,236 @@
+import os
+import shutil
+import subprocess
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from PIL import Image, ImageOps
+from sqlalchemy import update, select
+from . import db
+from .models import MediaJob, Art, Video, User
+from .media_store import locate, DERIVED_FOLDERS
+
+
+# Widths generated for art cards and square sizes for profile pictures
+ART_SIZES = (320, 640)
+AVATAR_SIZES = (64, 160)
+POSTER_WIDTH = 640
+
+MAX_ATTEMPTS = 3
+
+# Jobs stuck in 'running' this long (a worker died) are picked up again
+STALE_AFTER = timedelta(minutes=10)
+
+
+def stem(filename):
+    return os.path.splitext(filename)[0]
+
+
+def derived_path(name, folder):
+    # Stored originals keep derived files next to the blob, keyed by its
+    # hash, so every duplicate upload shares them
+    return locate(name, DERIVED_FOLDERS[folder])
+
+
+def has_variants(folder, base, sizes):
+    return all(os.path.exists(derived_path(f"{base}_{size}.jpg", folder)) for size in sizes)
+
+
+def save_variants(image, folder, name):
+    webp = derived_path(name + '.webp', folder)
+    os.makedirs(os.path.dirname(webp), exist_ok=True)
+    image.save(webp, 'WEBP', quality=80)
+    image.convert('RGB').save(derived_path(name + '.jpg', folder), 'JPEG', quality=85)
+
+
+# =========================
+# PROCESSORS
+# =========================
+
+def process_art(art_id):
+    art = db.session.get(Art, art_id)
+    if art is None or not art.art:
+        return
+
+    base = stem(art.art)
+    if not has_variants('art', base, ART_SIZES):
+        with Image.open(locate(art.art, 'art')) as original:
+            original = ImageOps.exif_transpose(original)
+            for width in ART_SIZES:
+                variant = original.copy()
+                variant.thumbnail((width, width * 4))
+                save_variants(variant, 'art', f"{base}_{width}")
+
+    art.thumbnail = base
+
+
+def process_avatar(user_id):
+    user = db.session.get(User, user_id)
+    if user is None or not user.profile_image:
+        return
+
+    base = stem(user.profile_image)
+    if not has_variants('uploads', base, AVATAR_SIZES):
+        with Image.open(locate(user.profile_image, 'uploads')) as original:
+            original = ImageOps.exif_transpose(original)
+            for size in AVATAR_SIZES:
+                variant = ImageOps.fit(original, (size, size))
+                save_variants(variant, 'uploads', f"{base}_{size}")
+
+    user.profile_thumb = base
+
+
+def process_video(video_id):
+    video = db.session.get(Video, video_id)
+    ffmpeg = shutil.which('ffmpeg')
+    if video is None or ffmpeg is None:
+        # No ffmpeg on this host: cards keep showing the first frame
+        return
+
+    poster = stem(video.video) + '_poster.jpg'
+    target = derived_path(poster, 'videos')
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        subprocess.run(
+            [
+                ffmpeg, '-y', '-loglevel', 'error',
+                '-ss', '1', '-i', locate(video.video, 'videos'),
+                '-frames:v', '1', '-vf', f'scale={POSTER_WIDTH}:-2',
+                target,
+            ],
+            check=True,
+            timeout=120
+        )
+    video.poster = poster
+
+
+PROCESSORS = {
+    'art': process_art,
+    'avatar': process_avatar,
+    'video': process_video,
+}
+
+
+# =========================
+# QUEUE
+# =========================
+
+def enqueue(kind, object_id):
+    """Queue a job; it runs once the caller's transaction commits."""
+    db.session.add(MediaJob(kind=kind, object_id=object_id))
+
+
+def claim_job():
+    # Claim the oldest queued job with a guarded UPDATE so that several
+    # threads or processes never run the same job
+    while True:
+        job_id = db.session.execute(
+            select(MediaJob.id)
+            .where(MediaJob.status == 'queued')
+            .order_by(MediaJob.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+
+        claimed = db.session.execute(
+            update(MediaJob)
+            .where(MediaJob.id == job_id, MediaJob.status == 'queued')
+            .values(
+                status='running',
+                attempts=MediaJob.attempts + 1,
+                date_updated=datetime.utcnow()
+            )
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(MediaJob, job_id)
+
+
+def run_job(job):
+    try:
+        PROCESSORS[job.kind](job.object_id)
+        db.session.delete(job)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        job.status = 'queued' if job.attempts < MAX_ATTEMPTS else 'failed'
+        job.error = repr(exc)
+        job.date_updated = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.warning("Media job %s (%s) failed: %r", job.id, job.kind, exc)
+
+
+def requeue_stale():
+    db.session.execute(
+        update(MediaJob)
+        .where(
+            MediaJob.status == 'running',
+            MediaJob.date_updated < datetime.utcnow() - STALE_AFTER
+        )
+        .values(status='queued')
+    )
+    db.session.commit()
+
+
+def drain():
+    """Run queued jobs in this thread until none are left."""
+    done = 0
+    requeue_stale()
+    while True:
+        job = claim_job()
+        if job is None:
+            return done
+        run_job(job)
+        done += 1
+
+
+# =========================
+# WORKER POOL
+# =========================
+
+class MediaWorker:
+    """A small pool of daemon threads working through the MediaJob table.
+
+    Threads start on the first wake() so CLI commands don't spawn them, then
+    poll every ``poll_interval`` seconds to pick up jobs queued by other
+    processes or left over from a restart.
+    """
+
+    def __init__(self, workers=2, poll_interval=30.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.app = None
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('MEDIA_WORKERS', self.workers)
+
+    def wake(self):
+        with self._lock:
+            if not self._threads:
+                for n in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._run, name=f"media-worker-{n}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    drain()
+                except Exception:
+                    self.app.logger.exception("Media worker crashed while draining")
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+media_worker = MediaWorker()
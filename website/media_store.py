@@ -0,0 +1,233 @@
+from flask import Blueprint, abort, current_app, send_from_directory, url_for
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from . import db
+from .models import MediaBlob
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+
+media_store = Blueprint("media_store", __name__)
+
+# Stored files are named "<sha256><ext>"; files derived from them (thumbnails,
+# posters) are "<sha256>_<suffix>" and live in the same directory
+STORED_NAME = re.compile(r'^[0-9a-f]{64}[\w.-]*$')
+
+# Where derived files of uploads made before the store existed are kept,
+# relative to static/
+DERIVED_FOLDERS = {
+    'art': 'art/thumbs',
+    'uploads': 'uploads/thumbs',
+    'videos': 'videos/posters',
+}
+
+# A stored URL always points at the same bytes, so it may be cached forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Bytes read from an upload at a time while hashing it
+BLOCK_SIZE = 64 * 1024
+
+
+def store_folder():
+    return current_app.config.get(
+        'MEDIA_STORE_FOLDER', os.path.join(current_app.instance_path, 'media')
+    )
+
+
+def blob_folder(digest):
+    # Sharded two levels deep ("ab/cd/abcd...") so no directory gets huge
+    return os.path.join(store_folder(), digest[:2], digest[2:4])
+
+
+def is_stored(name):
+    return bool(name) and STORED_NAME.match(name) is not None
+
+
+def locate(name, legacy_folder):
+    """Path on disk of a stored file, or of a pre-store file under static/."""
+    if is_stored(name):
+        return os.path.join(blob_folder(name[:64]), name)
+    return os.path.join(current_app.root_path, 'static', legacy_folder, name)
+
+
+def media_url(name, legacy_folder):
+    if is_stored(name):
+        return url_for('media_store.serve', name=name)
+    return url_for('static', filename=f"{legacy_folder}/{name}")
+
+# =========================
+# REFERENCES
+# =========================
+
+def acquire(digest, ext, size):
+    """Take a reference to a blob, creating its row on first use."""
+    taken = MediaBlob.query.filter_by(hash=digest).update({
+        MediaBlob.refcount: MediaBlob.refcount + 1,
+        MediaBlob.date_updated: datetime.utcnow()
+    })
+    if not taken:
+        try:
+            with db.session.begin_nested():
+                db.session.add(MediaBlob(hash=digest, ext=ext, size=size, refcount=1))
+        except IntegrityError:
+            # Someone stored the same bytes at the same moment
+            return acquire(digest, ext, size)
+    return db.session.get(MediaBlob, digest)
+
+
+def release(name, legacy_folder):
+    """Drop a reference taken by save()/add_file().
+
+    Stored blobs are only counted down here; 'flask gc-media' deletes them
+    once nothing uses them. Pre-store files belong to a single row, so they
+    and their derived files are removed straight away.
+    """
+    if not name:
+        return
+
+    if is_stored(name):
+        MediaBlob.query.filter_by(hash=name[:64]).update({
+            MediaBlob.refcount: MediaBlob.refcount - 1,
+            MediaBlob.date_updated: datetime.utcnow()
+        })
+        return
+
+    paths = [locate(name, legacy_folder)]
+    derived = DERIVED_FOLDERS.get(legacy_folder)
+    if derived:
+        folder = os.path.join(current_app.root_path, 'static', derived)
+        prefix = os.path.splitext(name)[0] + '_'
+        if os.path.isdir(folder):
+            paths += [os.path.join(folder, f) for f in os.listdir(folder) if f.startswith(prefix)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+# =========================
+# STORING FILES
+# =========================
+
+def save(file_storage):
+    """Store an uploaded file and return its name.
+
+    The reference is part of the caller's transaction, so commit it together
+    with the row that points at the file.
+    """
+    ext = os.path.splitext(file_storage.filename)[1].lower()
+    tmp_folder = os.path.join(store_folder(), 'tmp')
+    os.makedirs(tmp_folder, exist_ok=True)
+    tmp_path = os.path.join(tmp_folder, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, 'wb') as f:
+        for block in iter(lambda: file_storage.stream.read(BLOCK_SIZE), b''):
+            digest.update(block)
+            f.write(block)
+            size += len(block)
+
+    return add_file(tmp_path, ext, digest.hexdigest(), size)
+
+
+def add_file(path, ext, digest, size=None):
+    """Move a file whose sha256 is already known into the store."""
+    if size is None:
+        size = os.path.getsize(path)
+    blob = acquire(digest, ext.lower(), size)
+
+    # Identical bytes may already be there; replacing them is harmless and
+    # keeps this free of exists-then-write races
+    target = os.path.join(blob_folder(digest), blob.name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(path, target)
+    return blob.name
+
+# =========================
+# GARBAGE COLLECTION
+# =========================
+
+def collect_garbage(grace=timedelta(hours=24)):
+    """Delete blobs unreferenced for longer than ``grace``.
+
+    Also removes files that never got a row (the upload's transaction rolled
+    back) and stale temp files. Returns (files removed, bytes reclaimed).
+    """
+    cutoff = datetime.utcnow() - grace
+    removed = reclaimed = 0
+
+    dead = db.session.query(MediaBlob.hash).filter(
+        MediaBlob.refcount <= 0,
+        MediaBlob.date_updated < cutoff
+    ).all()
+    for (digest,) in dead:
+        # Guarded again in case the blob was uploaded anew since the SELECT
+        gone = MediaBlob.query.filter(
+            MediaBlob.hash == digest,
+            MediaBlob.refcount <= 0
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if gone:
+            removed, reclaimed = _remove_blob_files(digest, removed, reclaimed)
+
+    root = store_folder()
+    if not os.path.isdir(root):
+        return removed, reclaimed
+
+    cutoff_ts = cutoff.timestamp()
+    for folder, _, files in os.walk(root):
+        old = [
+            f for f in files
+            if os.path.getmtime(os.path.join(folder, f)) < cutoff_ts
+        ]
+        if os.path.basename(folder) == 'tmp':
+            orphans = old
+        else:
+            hashes = {f[:64] for f in old if is_stored(f)}
+            known = {
+                h for (h,) in db.session.query(MediaBlob.hash)
+                .filter(MediaBlob.hash.in_(hashes))
+            } if hashes else set()
+            orphans = [f for f in old if is_stored(f) and f[:64] not in known]
+
+        for f in orphans:
+            path = os.path.join(folder, f)
+            reclaimed += os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+
+    return removed, reclaimed
+
+
+def _remove_blob_files(digest, removed, reclaimed):
+    folder = blob_folder(digest)
+    if not os.path.isdir(folder):
+        return removed, reclaimed
+    for f in os.listdir(folder):
+        if f.startswith(digest):
+            path = os.path.join(folder, f)
+            reclaimed += os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+    return removed, reclaimed
+
+# =========================
+# SERVE MEDIA ROUTE
+# =========================
+
+@media_store.route('/m/<name>')
+def serve(name):
+    if not is_stored(name):
+        abort(404)
+
+    response = send_from_directory(
+        blob_folder(name[:64]),
+        name,
+        conditional=True,
+        max_age=IMMUTABLE_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
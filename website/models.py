@@ -34,6 +34,15 @@ class VerificationLinks(db.Model):
 
 
 class Follow(db.Model):
+    __table_args__ = (
+        # Also the index behind is_following() and a user's "following" list
+        db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow'),
+        # Single-column, so SQLite keeps each user's rows in id order and
+        # the paginated lists need no sort
+        db.Index('ix_follow_followed_id', 'followed_id'),
+        db.Index('ix_follow_follower_id', 'follower_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     follower_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     followed_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -58,6 +67,15 @@ class User(db.Model, UserMixin):
     profile_pic = db.Column(db.String(300), default="default.png")
 
     profile_image = db.Column(db.String(150), nullable=True, default=None)
+    # Stem of the resized variants made by media_jobs, None until processed
+    profile_thumb = db.Column(db.String(150), nullable=True, default=None)
+
+    # Maintained by notifier.notify/mark_read so the navbar needs no COUNT
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Maintained by follow_graph; 'flask reconcile-follows' recounts them
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     comments = db.relationship('Comment', backref='user', passive_deletes=True)
     
@@ -109,17 +127,13 @@ class User(db.Model, UserMixin):
     )
 
 
-    def follow(self, user):
-        if not self.is_following(user):
-            db.session.add(Follow(follower_id=self.id, followed_id=user.id))
-
-    def unfollow(self, user):
-        f = self.followed.filter_by(followed_id=user.id).first()
-        if f:
-            db.session.delete(f)
+    # Following and unfollowing go through follow_graph, which keeps the
+    # counts above in step
 
     def is_following(self, user):
-        return self.followed.filter_by(followed_id=user.id).first() is not None
+        return db.session.query(
+            Follow.query.filter_by(follower_id=self.id, followed_id=user.id).exists()
+        ).scalar()
 
 
 # =========================
@@ -127,23 +141,31 @@ class User(db.Model, UserMixin):
 # =========================
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index('ix_post_date_created_id', 'date_created', 'id'),
+        db.Index('ix_post_user_date_id', 'user_id', 'date_created', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    text = db.Column(db.Text, nullable=False, index=True)
+    text = db.Column(db.Text, nullable=False)  # searched through search_index
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
 
+    # Kept in step with the likes table by the like toggles
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     comments = db.relationship('Comment', backref='post', passive_deletes=True)
 
     @property
     def likes(self):
         return Like.query.filter_by(post_id=self.id, post_type='post').all()
 
-    @property
-    def like_count(self):
-        return len(self.likes)
-
 
 class Comment(db.Model):
+    __table_args__ = (
+        db.Index('ix_comment_post_date', 'post_id', 'date_created'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(225), nullable=False)
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
@@ -156,9 +178,15 @@ class Comment(db.Model):
 # =========================
 
 class Art(db.Model):
+    __table_args__ = (
+        db.Index('ix_art_date_created_id', 'date_created', 'id'),
+        db.Index('ix_art_user_date_id', 'user_id', 'date_created', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(150), index=True)
+    title = db.Column(db.String(150))
     art = db.Column(db.String(150), nullable=True)
+    thumbnail = db.Column(db.String(150), nullable=True)  # set by media_jobs
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
 
     user_id = db.Column(
@@ -167,6 +195,7 @@ class Art(db.Model):
         nullable=False
     )
 
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     comments = db.relationship(
         'ArtComment',
@@ -178,13 +207,13 @@ class Art(db.Model):
     def likes(self):
         return Like.query.filter_by(post_id=self.id, post_type='art').all()
 
-    @property
-    def like_count(self):
-        return len(self.likes)
-
 
 
 class ArtComment(db.Model):
+    __table_args__ = (
+        db.Index('ix_art_comment_art_date', 'art_id', 'date_created'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(225), nullable=False)
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
@@ -199,9 +228,15 @@ class ArtComment(db.Model):
 # =========================
 
 class Video(db.Model):
+    __table_args__ = (
+        db.Index('ix_video_date_created_id', 'date_created', 'id'),
+        db.Index('ix_video_user_date_id', 'user_id', 'date_created', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(150), index=True)
+    title = db.Column(db.String(150))
     video = db.Column(db.String(150), nullable=False)
+    poster = db.Column(db.String(150), nullable=True)  # set by media_jobs
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
     views = db.Column(db.Integer, default=0)
     user_id = db.Column(
@@ -210,6 +245,8 @@ class Video(db.Model):
         nullable=False
     )
 
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     comments = db.relationship(
         'VideoComment',
         backref='video',
@@ -220,12 +257,12 @@ class Video(db.Model):
     def likes(self):
         return Like.query.filter_by(post_id=self.id, post_type='video').all()
 
-    @property
-    def like_count(self):
-        return len(self.likes)
-
 
 class VideoComment(db.Model):
+    __table_args__ = (
+        db.Index('ix_video_comment_video_date', 'video_id', 'date_created'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(500), nullable=False)
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
@@ -235,6 +272,67 @@ class VideoComment(db.Model):
     user = db.relationship('User')
 
 
+# =========================
+# MEDIA PROCESSING
+# =========================
+
+class MediaJob(db.Model):
+    # Persistent queue for media_jobs; finished jobs are deleted, failed ones
+    # stay behind with their error
+    __table_args__ = (
+        db.Index('ix_media_job_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'art', 'video' or 'avatar'
+    object_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # 'queued', 'running', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class MediaBlob(db.Model):
+    # One row per distinct file in media_store, keyed by its sha256. Rows
+    # whose refcount has dropped to 0 are removed by 'flask gc-media'.
+    __table_args__ = (
+        db.Index('ix_media_blob_refcount_updated', 'refcount', 'date_updated'),
+    )
+
+    hash = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def name(self):
+        return self.hash + self.ext
+
+
+class Upload(db.Model):
+    # A resumable chunked video upload; the Video row is only created once
+    # every byte has arrived and the upload is finalized
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('user.id', ondelete="CASCADE"),
+        nullable=False
+    )
+    title = db.Column(db.String(150))
+    filename = db.Column(db.String(150), nullable=False)  # original name
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    # The chunk being written right now, if any: only one at a time, and
+    # received moves past it once it is on disk
+    claim = db.Column(db.String(32), nullable=True)  # uuid4 hex
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    checksum = db.Column(db.String(64), nullable=True)  # expected sha256 hex
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 # =========================
 # LIKES (ART + VIDEO)
 # =========================
@@ -262,6 +360,8 @@ class Like(db.Model):
             'post_type',
             name='unique_like'
         ),
+        # Counting and listing an item's likes
+        db.Index('ix_likes_post', 'post_id', 'post_type'),
     )
 
     # NO backref to avoid conflicts
@@ -272,6 +372,11 @@ class Like(db.Model):
 # =========================
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_read_date', 'user_id', 'is_read', 'date_created'),
+        db.Index('ix_notification_user_date_id', 'user_id', 'date_created', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -286,7 +391,13 @@ class Notification(db.Model):
 
     is_read = db.Column(db.Boolean, default=False)
 
-    date_created = db.Column(db.DateTime, default=db.func.now())
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Repeat likes/follows are folded into one row: from_user_id is the most
+    # recent actor, actor_count how many there are in total. Both are copied
+    # from the row's NotificationActors by notifier.
+    actor_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    recent_actor_ids = db.Column(db.String(100), nullable=True)  # "12,7,3", newest first
 
     from_user = db.relationship(
         'User',
@@ -294,3 +405,72 @@ class Notification(db.Model):
         backref='sent_notifications'
     )
 
+    actors = db.relationship(
+        'NotificationActor',
+        cascade='all, delete-orphan',
+        passive_deletes=True
+    )
+
+    @property
+    def recent_actors(self):
+        if not self.recent_actor_ids:
+            return [self.from_user_id]
+        return [int(user_id) for user_id in self.recent_actor_ids.split(',')]
+
+    @recent_actors.setter
+    def recent_actors(self, user_ids):
+        self.recent_actor_ids = ','.join(str(user_id) for user_id in user_ids)
+
+
+class NotificationActor(db.Model):
+    # Everyone folded into a like/follow Notification, so a repeat like
+    # isn't counted twice and an undone one comes off the count
+    __table_args__ = (
+        db.UniqueConstraint('notification_id', 'user_id', name='unique_notification_actor'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    notification_id = db.Column(
+        db.Integer,
+        db.ForeignKey('notification.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+
+
+# =========================
+# TIMELINE
+# =========================
+
+class TimelineEntry(db.Model):
+    # One row per (reader, item) written when a followed account publishes.
+    # object_type/object_id point at a Post, Art or Video like Like does.
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user_id',
+            'object_type',
+            'object_id',
+            name='unique_timeline_entry'
+        ),
+        db.Index('ix_timeline_entry_user_date', 'user_id', 'date_created', 'object_type', 'object_id'),
+        db.Index('ix_timeline_entry_object', 'object_type', 'object_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('user.id', ondelete="CASCADE"),
+        nullable=False
+    )
+    author_id = db.Column(
+        db.Integer,
+        db.ForeignKey('user.id', ondelete="CASCADE"),
+        nullable=False
+    )
+
+    object_type = db.Column(db.String(10), nullable=False)  # 'post', 'art' or 'video'
+    object_id = db.Column(db.Integer, nullable=False)
+
+    # Copied from the item so the timeline sorts without touching it
+    date_created = db.Column(db.DateTime, nullable=False)
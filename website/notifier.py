@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert, select
+from . import db
+from .models import User, Notification, NotificationActor
+from .cache import tag_changes
+
+
+# Event types folded into one row per (user, type, object) while unread
+COALESCED_TYPES = {'like', 'follow'}
+
+# Only events this close to the pending row are folded into it
+COALESCE_WINDOW = timedelta(hours=24)
+
+# Actors remembered by name on a folded row
+RECENT_ACTORS = 3
+
+
+# =========================
+# NOTIFICATIONS
+# =========================
+
+# Every Notification goes through here so User.unread_notifications, which
+# the navbar badge reads, stays in step with the unread rows.
+
+def _bump_unread(user_id, delta):
+    # Never below 0, so a counter that drifted low can't hide new ones
+    # behind the navbar's "> 0" badge; 'flask reconcile-notifications'
+    # puts a drifted counter right
+    bumped = User.unread_notifications + delta
+    User.query.filter_by(id=user_id).update(
+        {User.unread_notifications: case((bumped < 0, 0), else_=bumped)}
+    )
+    tag_changes(f"account:{user_id}")
+
+
+def _pending(user_id, type, object_id, object_type, since=None):
+    query = Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False,
+        Notification.type == type,
+        Notification.object_type == object_type,
+        Notification.object_id == object_id
+    )
+    if since is not None:
+        query = query.filter(Notification.date_created >= since)
+    return query.order_by(Notification.date_created.desc()).first()
+
+
+def _add_actor(notification_id, user_id):
+    db.session.execute(
+        insert(NotificationActor).prefix_with("OR IGNORE"),
+        {'notification_id': notification_id, 'user_id': user_id}
+    )
+
+
+def _refresh_actors(pending):
+    # The count is a subquery in the UPDATE itself, so concurrent likes
+    # can't both add one. The names are only for display.
+    pending.actor_count = select(func.count(NotificationActor.id)).where(
+        NotificationActor.notification_id == pending.id
+    ).scalar_subquery()
+    pending.recent_actors = [
+        user_id for (user_id,) in
+        db.session.query(NotificationActor.user_id)
+            .filter_by(notification_id=pending.id)
+            .order_by(NotificationActor.id.desc())
+            .limit(RECENT_ACTORS)
+    ]
+    pending.from_user_id = pending.recent_actors[0]
+
+
+def notify(user_id, from_user_id, type, object_id=None, object_type=None):
+    now = datetime.utcnow()
+
+    if type in COALESCED_TYPES:
+        pending = _pending(user_id, type, object_id, object_type, now - COALESCE_WINDOW)
+        if pending:
+            # Someone already counted (a like, unlike, like again) isn't added twice
+            _add_actor(pending.id, from_user_id)
+            _refresh_actors(pending)
+            pending.date_created = now
+            return
+
+    notification = Notification(
+        user_id=user_id,
+        from_user_id=from_user_id,
+        type=type,
+        object_id=object_id,
+        object_type=object_type,
+        date_created=now,
+        recent_actor_ids=str(from_user_id)
+    )
+    db.session.add(notification)
+    if type in COALESCED_TYPES:
+        db.session.flush()
+        _add_actor(notification.id, from_user_id)
+    _bump_unread(user_id, 1)
+
+
+def retract(user_id, from_user_id, type, object_id=None, object_type=None):
+    """Undo a pending notification, e.g. when a like is taken back.
+
+    Only unread rows that counted the actor are touched; anything older
+    has already been seen.
+    """
+    pending = _pending(user_id, type, object_id, object_type)
+    if not pending:
+        return
+
+    removed = NotificationActor.query.filter_by(
+        notification_id=pending.id,
+        user_id=from_user_id
+    ).delete(synchronize_session=False)
+    if not removed:
+        return
+
+    remaining = db.session.query(
+        NotificationActor.query.filter_by(notification_id=pending.id).exists()
+    ).scalar()
+    if not remaining:
+        db.session.delete(pending)
+        _bump_unread(user_id, -1)
+        return
+
+    _refresh_actors(pending)
+
+
+def mark_read(user_id, notifications):
+    """Mark just the given notifications read, e.g. the inbox page shown."""
+    ids = [n.id for n in notifications if not n.is_read]
+    if not ids:
+        return
+
+    marked = Notification.query.filter(
+        Notification.user_id == user_id,
+        Notification.id.in_(ids),
+        Notification.is_read == False
+    ).update({Notification.is_read: True}, synchronize_session=False)
+
+    _bump_unread(user_id, -marked)
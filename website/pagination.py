@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import or_, and_
+
+
+PAGE_SIZE = 20
+
+
+# =========================
+# KEYSET CURSORS
+# =========================
+
+# A cursor is "<date_created isoformat>_<id>" of the last item on a page.
+# It sorts with the (date_created, id) composite indexes, so every page is an
+# index range scan no matter how deep the reader has scrolled.
+
+def encode_cursor(item):
+    return f"{item.date_created.isoformat()}_{item.id}"
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        stamp, item_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(stamp), int(item_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(query, model, cursor=None, per_page=PAGE_SIZE):
+    """Return ``(items, next_cursor)`` for one page of ``query``, newest first.
+
+    ``next_cursor`` is None on the last page.
+    """
+    query = query.order_by(model.date_created.desc(), model.id.desc())
+
+    position = decode_cursor(cursor)
+    if position:
+        stamp, item_id = position
+        query = query.filter(or_(
+            model.date_created < stamp,
+            and_(model.date_created == stamp, model.id < item_id)
+        ))
+
+    items = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1])
+
+    return items, next_cursor
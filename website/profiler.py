@@ -0,0 +1,169 @@
+from flask import Blueprint, abort, current_app, g, has_request_context, jsonify, render_template, request
+from flask_login import login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter
+import json
+import os
+import re
+import threading
+import time
+import traceback
+
+
+profiler_stats = Blueprint("profiler_stats", __name__)
+
+# The same statement shape this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+WEBSITE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def statement_shape(statement):
+    """Collapse whitespace and IN lists so repeats of one query compare equal."""
+    shape = re.sub(r'\s+', ' ', statement).strip()
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', shape)
+
+
+def summary(shape, length=300):
+    # The column list says little about where a query comes from; the rest does
+    return re.sub(r'^SELECT .+? FROM ', 'SELECT ... FROM ', shape)[:length]
+
+
+def call_site():
+    # Innermost frame in our own code or a template: where the query came from
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(WEBSITE_DIR) and not frame.filename.endswith('profiler.py'):
+            return f"{os.path.relpath(frame.filename, WEBSITE_DIR)}:{frame.lineno}"
+    return None
+
+
+class QueryProfiler:
+    """Counts and times the SQL each request runs and flags N+1 patterns.
+
+    Results go out as X-Query-* response headers, one JSON log line per
+    request (a warning when something was flagged), per-route totals at
+    /debug/queries and, with QUERY_PROFILER_PANEL, a panel appended to HTML
+    pages. QUERY_PROFILER and the panel default to on in debug mode only.
+    """
+
+    def __init__(self, threshold=N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.threshold = app.config.get('N_PLUS_ONE_THRESHOLD', self.threshold)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _enabled(self):
+        return current_app.config.get('QUERY_PROFILER', current_app.debug)
+
+    def _start(self):
+        if self._enabled():
+            g.query_log = {'count': 0, 'seconds': 0.0, 'shapes': Counter(), 'sites': {}}
+            g.request_started = time.perf_counter()
+
+    def record(self, statement, seconds):
+        log = g.query_log
+        shape = statement_shape(statement)
+        log['count'] += 1
+        log['seconds'] += seconds
+        log['shapes'][shape] += 1
+        if log['shapes'][shape] == self.threshold:
+            log['sites'][shape] = call_site()
+
+    def _finish(self, response):
+        log = g.pop('query_log', None)
+        if log is None:
+            return response
+
+        repeated = [
+            {"count": count, "statement": summary(shape), "site": log['sites'].get(shape)}
+            for shape, count in log['shapes'].most_common()
+            if count >= self.threshold
+        ]
+        profile = {
+            "route": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": log['count'],
+            "sql_ms": round(log['seconds'] * 1000, 2),
+            "total_ms": round((time.perf_counter() - g.request_started) * 1000, 2),
+            "n_plus_one": repeated,
+        }
+        self._add_to_route(profile)
+
+        response.headers['X-Query-Count'] = str(profile['queries'])
+        response.headers['X-Query-Time'] = f"{profile['sql_ms']}ms"
+        if repeated:
+            response.headers['X-Query-N-Plus-One'] = str(len(repeated))
+            current_app.logger.warning("query profile %s", json.dumps(profile))
+        else:
+            current_app.logger.info("query profile %s", json.dumps(profile))
+
+        if current_app.config.get('QUERY_PROFILER_PANEL', current_app.debug):
+            _append_panel(response, profile)
+        return response
+
+    def _add_to_route(self, profile):
+        with self._lock:
+            stats = self.routes.setdefault(profile['route'], Counter())
+            stats['requests'] += 1
+            stats['queries'] += profile['queries']
+            stats['sql_ms'] += profile['sql_ms']
+            stats['max_queries'] = max(stats['max_queries'], profile['queries'])
+            stats['n_plus_one_requests'] += bool(profile['n_plus_one'])
+
+    def report(self):
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self.routes.items()}
+        for stats in routes.values():
+            stats['avg_queries'] = round(stats['queries'] / stats['requests'], 1)
+            stats['avg_sql_ms'] = round(stats['sql_ms'] / stats['requests'], 2)
+        return dict(sorted(routes.items(), key=lambda item: -item[1]['avg_queries']))
+
+
+query_profiler = QueryProfiler()
+
+
+def _append_panel(response, profile):
+    if response.mimetype != 'text/html' or response.direct_passthrough:
+        return
+    html = response.get_data(as_text=True)
+    at = html.rfind('</body>')
+    if at == -1:
+        return
+    panel = render_template('profiler_panel.html', profile=profile)
+    response.set_data(html[:at] + panel + html[at:])
+
+# =========================
+# ENGINE EVENTS
+# =========================
+
+# Every engine, replicas included; only statements run inside a profiled
+# request are recorded
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_log' in g:
+        query_profiler.record(statement, time.perf_counter() - conn.info['query_started'])
+
+# =========================
+# QUERY STATS ROUTE
+# =========================
+
+@profiler_stats.route('/debug/queries')
+@login_required
+def query_report():
+    # Only there while profiling, like the headers and the panel
+    if not query_profiler._enabled():
+        abort(404)
+    return jsonify(query_profiler.report())
@@ -0,0 +1,104 @@
+from sqlalchemy import select, func, or_, and_
+from datetime import datetime
+from . import db
+from .models import (
+    Post, Comment, Art, ArtComment, Video, VideoComment, Like, Follow,
+    Notification, TimelineEntry
+)
+from .pagination import PAGE_SIZE
+
+
+# =========================
+# HOT QUERIES
+# =========================
+
+# The shapes the busiest pages run, with made-up ids. Each must be answered
+# from an index: no full table scan and no sort of the whole result.
+
+SOME_DATE = datetime(2024, 1, 1)
+
+
+def _page(model, *criteria):
+    # Same ordering and cursor filter as pagination.keyset_page
+    return select(model).where(
+        *criteria,
+        or_(
+            model.date_created < SOME_DATE,
+            and_(model.date_created == SOME_DATE, model.id < 100)
+        )
+    ).order_by(model.date_created.desc(), model.id.desc()).limit(PAGE_SIZE + 1)
+
+
+def hot_queries():
+    return {
+        "home feed page": _page(Post),
+        "media page (art)": _page(Art),
+        "media page (videos)": _page(Video),
+        "profile posts": _page(Post, Post.user_id == 1),
+        "profile art": _page(Art, Art.user_id == 1),
+        "profile videos": _page(Video, Video.user_id == 1),
+        "timeline page": select(TimelineEntry).where(
+            TimelineEntry.user_id == 1,
+            or_(
+                TimelineEntry.date_created < SOME_DATE,
+                and_(TimelineEntry.date_created == SOME_DATE, TimelineEntry.object_type < 'post')
+            )
+        ).order_by(
+            TimelineEntry.date_created.desc(),
+            TimelineEntry.object_type.desc(),
+            TimelineEntry.object_id.desc()
+        ).limit(PAGE_SIZE + 1),
+        "notifications page": _page(Notification, Notification.user_id == 1),
+        "unread notification to fold into": select(Notification).where(
+            Notification.user_id == 1,
+            Notification.is_read == False,
+            Notification.type == 'like',
+            Notification.object_type == 'post',
+            Notification.object_id == 1
+        ).order_by(Notification.date_created.desc()).limit(1),
+        "post comments": select(Comment).where(Comment.post_id.in_([1, 2, 3])),
+        "art comments": select(ArtComment).where(ArtComment.art_id.in_([1, 2, 3])),
+        "video comments": select(VideoComment).where(VideoComment.video_id.in_([1, 2, 3])),
+        "like count": select(func.count(Like.id)).where(
+            Like.post_id == 1, Like.post_type == 'post'
+        ),
+        "viewer's likes on a page": select(Like.post_id).where(
+            Like.user_id == 1, Like.post_type == 'post', Like.post_id.in_([1, 2, 3])
+        ),
+        "is following": select(Follow).where(
+            Follow.follower_id == 1, Follow.followed_id == 2
+        ).limit(1),
+        "viewer's follows among a page": select(Follow.followed_id).where(
+            Follow.follower_id == 1, Follow.followed_id.in_([1, 2, 3])
+        ),
+        "followers page": select(Follow).where(Follow.followed_id == 1, Follow.id < 100)
+            .order_by(Follow.id.desc()).limit(51),
+        "following page": select(Follow).where(Follow.follower_id == 1, Follow.id < 100)
+            .order_by(Follow.id.desc()).limit(51),
+    }
+
+# =========================
+# CHECKING PLANS
+# =========================
+
+def explain(statement):
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    with db.engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def problems(plan):
+    """Steps of a SQLite plan that read a whole table or sort in memory."""
+    return [
+        step for step in plan
+        if (step.startswith("SCAN ") and "INDEX" not in step)
+        or step.startswith("USE TEMP B-TREE")
+    ]
+
+
+def check_plans():
+    """Return ``{name: (plan, problems)}`` for every hot query."""
+    return {
+        name: (plan, problems(plan))
+        for name, plan in ((name, explain(statement)) for name, statement in hot_queries().items())
+    }
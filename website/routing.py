@@ -0,0 +1,82 @@
+from flask import g, current_app, has_request_context, request
+from flask import session as cookie_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, create_engine
+from sqlalchemy.sql.dml import UpdateBase
+from functools import wraps
+import random
+import time
+
+
+# After a user writes, their reads stay on the primary this long, so they see
+# their own changes even if the replicas lag behind
+READ_YOUR_WRITES_SECONDS = 10
+
+
+def init_replicas(app, engine_options):
+    """Create an engine per SQLALCHEMY_REPLICA_URIS entry.
+
+    They are kept out of SQLALCHEMY_BINDS so db.create_all()/drop_all()
+    never touch them. SQLite paths must be absolute here.
+    """
+    engines = [
+        create_engine(uri, **engine_options)
+        for uri in app.config.get('SQLALCHEMY_REPLICA_URIS', [])
+    ]
+    app.extensions['replicas'] = engines
+    return engines
+
+
+class RoutingSession(Session):
+    """Sends reads to a replica inside @use_replica views, everything else to
+    the primary.
+
+    Flushes, ORM bulk UPDATE/DELETE and anything after the first write in the
+    same session go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+
+        if bind is None and not self.info.get('wrote'):
+            replica = _request_replica()
+            if replica is not None:
+                return replica
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _request_replica():
+    if not has_request_context() or not g.get('use_replica'):
+        return None
+    # One replica per request, so its reads see a single snapshot
+    if 'replica' not in g:
+        replicas = current_app.extensions.get('replicas')
+        g.replica = random.choice(replicas) if replicas else None
+    return g.replica
+
+
+def reads_from_replica(session):
+    """Whether ``session``'s next read in this request goes to a replica."""
+    return not session.info.get('wrote') and _request_replica() is not None
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def remember_write(session):
+    if session.info.get('wrote') and has_request_context():
+        window = current_app.config.get('READ_YOUR_WRITES_SECONDS', READ_YOUR_WRITES_SECONDS)
+        cookie_session['primary_until'] = time.time() + window
+
+
+def use_replica(view):
+    """Let a view's GET requests read from a replica.
+
+    Skipped for a user who wrote within the last READ_YOUR_WRITES_SECONDS.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if request.method == 'GET' and cookie_session.get('primary_until', 0) < time.time():
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return decorated
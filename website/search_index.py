@@ -0,0 +1,170 @@
+from sqlalchemy import event, inspect, text, bindparam, DDL
+from sqlalchemy.orm import Session, joinedload
+from . import db
+from .models import User, Post, Art, Video
+import re
+
+
+# Results shown per type on one search page
+RESULTS_PER_TYPE = 10
+
+# Deepest offset a "more results" link may ask for
+MAX_OFFSET = 500
+
+# model -> (FTS table, indexed attribute). One table per kind, so each
+# search only ranks its own kind and BM25 statistics aren't mixed between
+# usernames and posts. The FTS rowid is the object's id.
+INDEXED = {
+    User: ('search_index_user', 'username'),
+    Post: ('search_index_post', 'text'),
+    Art: ('search_index_art', 'title'),
+    Video: ('search_index_video', 'title'),
+}
+
+CREATE_INDEXES = [
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    for table, _ in INDEXED.values()
+]
+
+# db.create_all() creates the virtual tables alongside the ORM tables
+for create_index in CREATE_INDEXES:
+    event.listen(db.metadata, 'after_create', create_index.execute_if(dialect='sqlite'))
+
+
+def match_expression(q):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r'\w+', q)
+    return ' '.join(f'"{word}"*' for word in words)
+
+# =========================
+# QUERYING
+# =========================
+
+def search(model, q, cursor=None, per_page=RESULTS_PER_TYPE):
+    """Return ``(items, next_cursor)`` for ``model`` rows matching ``q``.
+
+    Best BM25 matches (FTS5's default rank) come first. The cursor is the
+    offset of the next page, since scores shift as content is added and
+    can't anchor a keyset.
+    """
+    expression = match_expression(q)
+    if not expression:
+        return [], None
+
+    try:
+        offset = min(max(int(cursor or 0), 0), MAX_OFFSET)
+    except ValueError:
+        offset = 0
+
+    table = INDEXED[model][0]
+    ids = db.session.execute(
+        text(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH :expression "
+            f"ORDER BY rank, rowid "
+            f"LIMIT :limit OFFSET :offset"
+        ),
+        {
+            "expression": expression,
+            "limit": per_page + 1,
+            "offset": offset,
+        }
+    ).scalars().all()
+
+    next_cursor = None
+    if len(ids) > per_page:
+        ids = ids[:per_page]
+        if offset + per_page <= MAX_OFFSET:
+            next_cursor = str(offset + per_page)
+
+    if not ids:
+        return [], next_cursor
+
+    query = model.query.filter(model.id.in_(ids))
+    if model is not User:
+        query = query.options(joinedload(model.user))
+    by_id = {item.id: item for item in query}
+    return [by_id[i] for i in ids if i in by_id], next_cursor
+
+# =========================
+# KEEPING IN SYNC
+# =========================
+
+def _write(connection, model, obj):
+    table, column = INDEXED[model]
+    connection.execute(text(f"DELETE FROM {table} WHERE rowid = :rowid"), {"rowid": obj.id})
+    body = getattr(obj, column)
+    if body:
+        connection.execute(
+            text(f"INSERT INTO {table} (rowid, body) VALUES (:rowid, :body)"),
+            {"rowid": obj.id, "body": body}
+        )
+
+
+def _changed(model, obj):
+    return inspect(obj).attrs[INDEXED[model][1]].history.has_changes()
+
+
+@event.listens_for(Session, 'before_flush')
+def drop_deleted_users_content(session, flush_context, instances):
+    # A user's posts, art and videos are removed by ON DELETE CASCADE, which
+    # the ORM never sees, so drop their entries while the rows still exist
+    user_ids = [obj.id for obj in session.deleted if isinstance(obj, User)]
+    if not user_ids:
+        return
+
+    connection = session.connection()
+    for model in (Post, Art, Video):
+        connection.execute(
+            text(
+                f"DELETE FROM {INDEXED[model][0]} WHERE rowid IN "
+                f"(SELECT id FROM {model.__table__.name} WHERE user_id IN :user_ids)"
+            ).bindparams(bindparam("user_ids", expanding=True)),
+            {"user_ids": user_ids}
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def sync_search_index(session, flush_context):
+    connection = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        model = type(obj)
+        if model not in INDEXED:
+            continue
+        if obj in session.dirty and not _changed(model, obj):
+            continue
+
+        connection = connection or session.connection()
+        if obj in session.deleted:
+            connection.execute(
+                text(f"DELETE FROM {INDEXED[model][0]} WHERE rowid = :rowid"),
+                {"rowid": obj.id}
+            )
+        else:
+            _write(connection, model, obj)
+
+# =========================
+# REBUILDING
+# =========================
+
+def rebuild():
+    """Recreate the indexes from the tables; returns the number of entries."""
+    # The single table every kind shared before
+    db.session.execute(text("DROP TABLE IF EXISTS search_index"))
+
+    count = 0
+    for (model, (table, column)), create_index in zip(INDEXED.items(), CREATE_INDEXES):
+        db.session.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        db.session.execute(text(str(create_index.statement)))
+        db.session.execute(text(
+            f"INSERT INTO {table} (rowid, body) "
+            f"SELECT id, {column} FROM {model.__table__.name} "
+            f"WHERE {column} IS NOT NULL AND {column} != ''"
+        ))
+        db.session.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+        count += db.session.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+    db.session.commit()
+    return count
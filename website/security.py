@@ -0,0 +1,233 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+
+
+HASH_METHOD = 'pbkdf2:sha256'
+
+# Longer passwords are refused before hashing, so one request can't buy an
+# arbitrarily expensive hash
+MAX_PASSWORD_LENGTH = 1024
+
+
+class Overloaded(Exception):
+    """More hashes are queued than PASSWORD_HASH_QUEUE allows; retry later."""
+
+
+# =========================
+# PASSWORD HASHING
+# =========================
+
+class PasswordHasher:
+    """Runs pbkdf2 in a small process pool instead of on the request thread.
+
+    A hash takes a CPU core for a good fraction of a second and holds the
+    GIL while it does, so a burst of logins on the request threads would
+    stall every other page. In the pool they only compete with each other,
+    and once PASSWORD_HASH_QUEUE are waiting further logins get Overloaded
+    (a quick 503) instead of joining the queue. PASSWORD_HASH_WORKERS = 0
+    hashes inline, e.g. for tests.
+    """
+
+    def __init__(self, workers=None, max_queued=None, timeout=10):
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 2) // 2)
+        self.max_queued = max_queued or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_queued)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+        atexit.register(self.shutdown)
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_queued = app.config.get('PASSWORD_HASH_QUEUE', self.workers * 4 or self.max_queued)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_queued)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the app has threads (media worker, view
+                # counter) and open database connections a fork would copy
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        try:
+            return self._attempt(fn, args)
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory) and took the pool down
+            # with it; _attempt dropped that pool, so this gets a fresh one
+            try:
+                return self._attempt(fn, args)
+            except BrokenProcessPool:
+                raise Overloaded()
+
+    def _attempt(self, fn, args):
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        pool = self._executor()
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(pool)
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise Overloaded()
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, HASH_METHOD)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash.
+
+        With ``pwhash`` None (no such account) a throwaway hash is checked
+        instead, so an unknown email costs as much as a wrong password and
+        response times don't reveal which accounts exist.
+        """
+        if password is None or len(password) > MAX_PASSWORD_LENGTH:
+            return False
+        if pwhash is None:
+            self._run(check_password_hash, self._dummy(), password)
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def _dummy(self):
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+# =========================
+# LOGIN THROTTLING
+# =========================
+
+class SlidingWindowLimiter:
+    """Allows ``limit`` hits per key in any ``window`` seconds.
+
+    Keeps each key's hit times in memory, per worker process; the least
+    recently hit keys are dropped past ``max_keys``.
+    """
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()  # key -> deque of monotonic times
+        self._lock = threading.Lock()
+
+    def _prune(self, key, now):
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if not hits:
+            del self._hits[key]
+            return None
+        return hits
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may try again; 0 if it may now."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._prune(key, now)
+            if hits is None or len(hits) < self.limit:
+                return 0
+            return int(hits[-self.limit] + self.window - now) + 1
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._prune(key, now)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            hits.append(now)
+            self._hits.move_to_end(key)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class LoginThrottle:
+    """Failed logins allowed per client IP, per account from one IP, and
+    per account from everywhere, per window.
+
+    The per-(IP, account) limit is low, so someone guessing at an account
+    from one address locks only themselves out of it. The account-wide one
+    is higher: it catches guessing spread over many addresses, and while it
+    is tripped the owner has to wait too.
+    """
+
+    def __init__(self, per_ip=20, per_account=5, per_account_total=50, window=15 * 60):
+        self.by_ip = SlidingWindowLimiter(per_ip, window)
+        self.by_ip_and_account = SlidingWindowLimiter(per_account, window)
+        self.by_account = SlidingWindowLimiter(per_account_total, window)
+
+    def init_app(self, app):
+        window = app.config.get('LOGIN_FAILURE_WINDOW', self.by_ip.window)
+        self.by_ip = SlidingWindowLimiter(
+            app.config.get('LOGIN_FAILURES_PER_IP', self.by_ip.limit), window
+        )
+        self.by_ip_and_account = SlidingWindowLimiter(
+            app.config.get('LOGIN_FAILURES_PER_ACCOUNT', self.by_ip_and_account.limit), window
+        )
+        self.by_account = SlidingWindowLimiter(
+            app.config.get('LOGIN_FAILURES_PER_ACCOUNT_TOTAL', self.by_account.limit), window
+        )
+
+    def retry_after(self, ip, email):
+        email = email.lower()
+        return max(
+            self.by_ip.retry_after(ip),
+            self.by_ip_and_account.retry_after((ip, email)),
+            self.by_account.retry_after(email)
+        )
+
+    def failed(self, ip, email):
+        email = email.lower()
+        self.by_ip.hit(ip)
+        self.by_ip_and_account.hit((ip, email))
+        self.by_account.hit(email)
+
+    def succeeded(self, ip, email):
+        self.by_ip_and_account.reset((ip, email.lower()))
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,231 @@
+import time
+from datetime import datetime
+from sqlalchemy import insert, select, or_, and_
+from . import db
+from .models import Follow, Post, Art, Video, TimelineEntry
+from . import follow_graph
+from .feed import card_options, load_like_state
+
+
+# Most entries kept per reader; older ones are trimmed away
+TIMELINE_CAP = 800
+
+# Accounts with at least this many followers are not fanned out on write;
+# their items are merged into each reader's timeline at read time instead
+FANOUT_LIMIT = 5000
+
+# Items copied into a reader's timeline when they follow someone new
+BACKFILL_LIMIT = 50
+
+# How long the set of high fan-out accounts is reused before recounting
+HIGH_FANOUT_TTL = 300
+
+CONTENT_MODELS = {'post': Post, 'art': Art, 'video': Video}
+
+_high_fanout = {'ids': frozenset(), 'expires': 0.0}
+
+
+def high_fanout_authors():
+    if time.monotonic() >= _high_fanout['expires']:
+        _high_fanout['ids'] = frozenset(follow_graph.popular_user_ids(FANOUT_LIMIT))
+        _high_fanout['expires'] = time.monotonic() + HIGH_FANOUT_TTL
+    return _high_fanout['ids']
+
+
+def _insert_entries(rows):
+    if rows:
+        db.session.execute(insert(TimelineEntry).prefix_with("OR IGNORE"), rows)
+
+
+def _entry(user_id, object_type, item):
+    return {
+        'user_id': user_id,
+        'author_id': item.user_id,
+        'object_type': object_type,
+        'object_id': item.id,
+        'date_created': item.date_created,
+    }
+
+
+# =========================
+# WRITE PATH
+# =========================
+
+def fan_out(item, object_type):
+    """Copy a new item into the timelines of its author and their followers.
+
+    ``item`` must already be flushed so it has an id and date_created.
+    Readers' timelines aren't trimmed here, which would cost a query per
+    follower on every post; 'flask trim-timelines' brings them back to
+    TIMELINE_CAP and is meant to run on a schedule.
+    """
+    reader_ids = [item.user_id]
+    if item.user_id not in high_fanout_authors():
+        reader_ids += [
+            follower_id for (follower_id,) in
+            db.session.query(Follow.follower_id).filter_by(followed_id=item.user_id)
+        ]
+
+    _insert_entries([_entry(reader_id, object_type, item) for reader_id in reader_ids])
+
+
+def remove(object_type, object_id):
+    TimelineEntry.query.filter_by(
+        object_type=object_type,
+        object_id=object_id
+    ).delete(synchronize_session=False)
+
+
+def backfill(follower_id, followed_id):
+    """Copy the newest items of a newly followed account into a timeline."""
+    if followed_id in high_fanout_authors():
+        return
+
+    items = []
+    for object_type, model in CONTENT_MODELS.items():
+        latest = model.query.filter_by(user_id=followed_id)\
+            .order_by(model.date_created.desc())\
+            .limit(BACKFILL_LIMIT)\
+            .all()
+        items += [(object_type, item) for item in latest]
+
+    items.sort(key=lambda pair: pair[1].date_created, reverse=True)
+    _insert_entries([
+        _entry(follower_id, object_type, item)
+        for object_type, item in items[:BACKFILL_LIMIT]
+    ])
+    trim(follower_id)
+
+
+def purge(follower_id, followed_id):
+    TimelineEntry.query.filter_by(
+        user_id=follower_id,
+        author_id=followed_id
+    ).delete(synchronize_session=False)
+
+
+def trim(user_id):
+    # Keeps the newest TIMELINE_CAP entries in read()'s order, so entries
+    # sharing the boundary timestamp stay or go one by one
+    newest = select(TimelineEntry.id)\
+        .where(TimelineEntry.user_id == user_id)\
+        .order_by(
+            TimelineEntry.date_created.desc(),
+            TimelineEntry.object_type.desc(),
+            TimelineEntry.object_id.desc()
+        )\
+        .limit(TIMELINE_CAP)
+
+    TimelineEntry.query.filter(
+        TimelineEntry.user_id == user_id,
+        TimelineEntry.id.not_in(newest)
+    ).delete(synchronize_session=False)
+
+
+# =========================
+# READ PATH
+# =========================
+
+# A cursor is "<date_created isoformat>_<object_type>_<object_id>" of the
+# last item shown. Items from timeline_entry and those pulled from high
+# fan-out accounts are ordered by the same (date, type, id) key, so items
+# sharing a timestamp are neither skipped nor repeated across pages.
+
+def encode_cursor(date_created, object_type, object_id):
+    return f"{date_created.isoformat()}_{object_type}_{object_id}"
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        stamp, object_type, object_id = cursor.rsplit("_", 2)
+        return datetime.fromisoformat(stamp), object_type, int(object_id)
+    except ValueError:
+        return None
+
+
+def read(viewer, cursor=None, per_page=20):
+    """Return ``(items, next_cursor, liked)`` for one page of a timeline.
+
+    ``items`` is a list of ``(object_type, item)`` pairs, newest first, and
+    ``liked`` maps each object type to the ids the viewer has liked.
+    """
+    position = decode_cursor(cursor)
+
+    entries = TimelineEntry.query.filter_by(user_id=viewer.id)
+    if position:
+        stamp, object_type, object_id = position
+        entries = entries.filter(or_(
+            TimelineEntry.date_created < stamp,
+            and_(
+                TimelineEntry.date_created == stamp,
+                or_(
+                    TimelineEntry.object_type < object_type,
+                    and_(TimelineEntry.object_type == object_type, TimelineEntry.object_id < object_id)
+                )
+            )
+        ))
+    entries = entries.order_by(
+        TimelineEntry.date_created.desc(),
+        TimelineEntry.object_type.desc(),
+        TimelineEntry.object_id.desc()
+    ).limit(per_page + 1).all()
+
+    refs = {(e.object_type, e.object_id): e.date_created for e in entries}
+
+    # Fan-out on read for followed accounts too big to fan out on write
+    high_fanout = high_fanout_authors()
+    if high_fanout:
+        pulled_from = [
+            followed_id for (followed_id,) in
+            db.session.query(Follow.followed_id).filter(
+                Follow.follower_id == viewer.id,
+                Follow.followed_id.in_(high_fanout)
+            )
+        ]
+        if viewer.id in high_fanout:
+            pulled_from.append(viewer.id)
+
+        for object_type, model in CONTENT_MODELS.items():
+            if not pulled_from:
+                break
+            query = db.session.query(model.id, model.date_created)\
+                .filter(model.user_id.in_(pulled_from))
+            if position:
+                stamp, after_type, after_id = position
+                # Every item here has the same type, so the tie on date is
+                # settled by how it compares with the cursor's type
+                if object_type < after_type:
+                    query = query.filter(model.date_created <= stamp)
+                elif object_type == after_type:
+                    query = query.filter(or_(
+                        model.date_created < stamp,
+                        and_(model.date_created == stamp, model.id < after_id)
+                    ))
+                else:
+                    query = query.filter(model.date_created < stamp)
+            for item_id, date_created in query.order_by(model.date_created.desc(), model.id.desc())\
+                    .limit(per_page + 1):
+                refs[(object_type, item_id)] = date_created
+
+    ordered = sorted(refs.items(), key=lambda ref: (ref[1], ref[0]), reverse=True)
+    next_cursor = None
+    if len(ordered) > per_page:
+        ordered = ordered[:per_page]
+        (object_type, object_id), date_created = ordered[-1]
+        next_cursor = encode_cursor(date_created, object_type, object_id)
+
+    loaded = {}
+    liked = {}
+    for object_type, model in CONTENT_MODELS.items():
+        ids = [object_id for (kind, object_id), _ in ordered if kind == object_type]
+        if not ids:
+            liked[object_type] = set()
+            continue
+        rows = model.query.options(*card_options(model)).filter(model.id.in_(ids)).all()
+        loaded.update({(object_type, row.id): row for row in rows})
+        liked[object_type] = load_like_state(rows, object_type, viewer)
+
+    items = [(ref[0], loaded[ref]) for ref, _ in ordered if ref in loaded]
+    return items, next_cursor, liked
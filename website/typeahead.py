@@ -0,0 +1,92 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from bisect import bisect_left, insort
+from . import db
+from .models import User
+import sys
+import threading
+import time
+
+
+typeahead = Blueprint("typeahead", __name__)
+
+SUGGESTIONS = 8
+
+# Other workers' signups and renames only reach this process on a rebuild
+REBUILD_AFTER = 300
+
+
+class UsernameIndex:
+    """Sorted array of ``(username.lower(), username, id)`` for prefix lookups.
+
+    A lookup is two bisects plus a short slice, so it stays well under a
+    millisecond for hundreds of thousands of users. Built from a single
+    two-column query the first time it is used.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        rows = db.session.query(User.username, User.id).filter(User.username != None)
+        entries = sorted((name.lower(), name, user_id) for name, user_id in rows)
+        with self._lock:
+            self._entries = entries
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if self._built_at is None or time.monotonic() - self._built_at > REBUILD_AFTER:
+            self.build()
+
+    def complete(self, prefix, limit=SUGGESTIONS):
+        self._ensure_built()
+        key = prefix.lower()
+        with self._lock:
+            entries = self._entries
+            start = bisect_left(entries, (key,))
+            end = len(entries)
+            if key and ord(key[-1]) < sys.maxunicode:
+                # The smallest string after every one starting with key
+                end = bisect_left(entries, (key[:-1] + chr(ord(key[-1]) + 1),), start)
+            return [(user_id, name) for _, name, user_id in entries[start:min(end, start + limit)]]
+
+    def add(self, user_id, username):
+        if self._built_at is None or not username:
+            return
+        with self._lock:
+            insort(self._entries, (username.lower(), username, user_id))
+
+    def remove(self, user_id, username):
+        if self._built_at is None or not username:
+            return
+        entry = (username.lower(), username, user_id)
+        with self._lock:
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def rename(self, user_id, old, new):
+        if old != new:
+            self.remove(user_id, old)
+            self.add(user_id, new)
+
+
+username_index = UsernameIndex()
+
+# =========================
+# AUTOCOMPLETE ROUTE
+# =========================
+
+@typeahead.route('/autocomplete/users')
+@login_required
+def autocomplete_users():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify([])
+
+    return jsonify([
+        {"id": user_id, "username": name}
+        for user_id, name in username_index.complete(q)
+    ])
@@ -0,0 +1,221 @@
+from flask import Blueprint, request, jsonify, abort, current_app, url_for
+from flask_login import login_required, current_user
+from .models import Upload, Video
+from . import db
+from . import timeline
+from . import media_jobs
+from . import media_store
+from .views import allowed_video
+from sqlalchemy import or_
+from datetime import datetime, timedelta
+import hashlib
+import os
+import uuid
+
+
+uploads = Blueprint("uploads", __name__)
+
+# Suggested chunk size sent back to clients; must stay under MAX_CONTENT_LENGTH
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Bytes read from the request or file at a time
+BLOCK_SIZE = 64 * 1024
+
+# A chunk claim older than this is taken to belong to a request that died
+CLAIM_TIMEOUT = 10 * 60  # seconds
+
+
+def incoming_folder():
+    return os.path.join(current_app.instance_path, 'uploads')
+
+
+def partial_path(upload):
+    return os.path.join(incoming_folder(), upload.id + '.part')
+
+
+def get_upload_or_404(upload_id):
+    upload = db.session.get(Upload, upload_id)
+    if upload is None or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+
+def upload_state(upload):
+    return {
+        "upload_id": upload.id,
+        "offset": upload.received,
+        "size": upload.total_size,
+        "chunk_size": CHUNK_SIZE,
+    }
+
+# =========================
+# START UPLOAD ROUTE
+# =========================
+
+@uploads.route('/uploads', methods=['POST'])
+@login_required
+def init_upload():
+    data = request.get_json(silent=True) or request.form
+    filename = data.get('filename') or ''
+    checksum = (data.get('sha256') or '').lower() or None
+
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "size is required"}), 400
+
+    max_size = current_app.config.get('MAX_VIDEO_UPLOAD_SIZE', 2 * 1024 * 1024 * 1024)
+    if not allowed_video(filename):
+        return jsonify({"error": "Invalid file type."}), 400
+    if size <= 0 or size > max_size:
+        return jsonify({"error": "Invalid file size."}), 400
+    if checksum is not None and len(checksum) != 64:
+        return jsonify({"error": "sha256 must be 64 hex characters."}), 400
+
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        title=data.get('title'),
+        filename=filename,
+        total_size=size,
+        checksum=checksum
+    )
+    os.makedirs(incoming_folder(), exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify(upload_state(upload)), 201
+
+# =========================
+# UPLOAD STATUS ROUTE
+# =========================
+
+@uploads.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    # Clients resume from the returned offset after an interruption
+    return jsonify(upload_state(get_upload_or_404(upload_id)))
+
+# =========================
+# UPLOAD CHUNK ROUTE
+# =========================
+
+@uploads.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    upload = get_upload_or_404(upload_id)
+    offset = request.args.get('offset', type=int)
+
+    # Chunks must arrive in order; a client that lost track gets the offset
+    # to resume from
+    if offset != upload.received:
+        return jsonify(upload_state(upload)), 409
+
+    length = request.content_length
+    if not length or offset + length > upload.total_size:
+        return jsonify({"error": "Chunk is empty or past the end of the file."}), 400
+
+    # Claim the upload before writing, so only one chunk is written at a
+    # time; the request that loses gets the offset to resume from
+    claim = uuid.uuid4().hex
+    now = datetime.utcnow()
+    claimed = Upload.query.filter(
+        Upload.id == upload.id,
+        Upload.received == offset,
+        or_(Upload.claim == None, Upload.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT))
+    ).update({Upload.claim: claim, Upload.claimed_at: now}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return jsonify(upload_state(upload)), 409
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(partial_path(upload), 'r+b') as f:
+        f.seek(offset)
+        while True:
+            block = request.stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            written += len(block)
+
+    expected = request.headers.get('X-Chunk-SHA256')
+    ok = written == length and (not expected or expected.lower() == digest.hexdigest())
+
+    # Bytes past received are never trusted, so a bad chunk is left for the
+    # resend to overwrite; only this request's claim is released
+    done = {Upload.claim: None, Upload.claimed_at: None}
+    if ok:
+        done[Upload.received] = offset + length
+    moved = Upload.query.filter_by(id=upload.id, claim=claim)\
+        .update(done, synchronize_session=False)
+    db.session.commit()
+
+    if not ok:
+        return jsonify({"error": "Chunk was incomplete or corrupted."}), 400
+    if not moved:
+        # Our claim timed out and another request took over this range
+        return jsonify(upload_state(upload)), 409
+    return jsonify(upload_state(upload))
+
+# =========================
+# FINALIZE UPLOAD ROUTE
+# =========================
+
+@uploads.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    upload = get_upload_or_404(upload_id)
+    if upload.received != upload.total_size or upload.claim is not None:
+        return jsonify(upload_state(upload)), 409
+
+    # received only counts verified chunks, so the file must match it exactly
+    path = partial_path(upload)
+    if os.path.getsize(path) != upload.received:
+        return jsonify({"error": "Upload is missing data, upload discarded."}), 422
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+
+    if upload.checksum and upload.checksum != digest.hexdigest():
+        os.remove(path)
+        db.session.delete(upload)
+        db.session.commit()
+        return jsonify({"error": "Checksum mismatch, upload discarded."}), 422
+
+    ext = os.path.splitext(upload.filename)[1]
+    filename = media_store.add_file(path, ext, digest.hexdigest(), upload.total_size)
+
+    video = Video(title=upload.title, video=filename, user_id=current_user.id)
+    db.session.add(video)
+    db.session.flush()
+    timeline.fan_out(video, 'video')
+    media_jobs.enqueue('video', video.id)
+    db.session.delete(upload)
+    db.session.commit()
+    media_jobs.media_worker.wake()
+
+    return jsonify({
+        "video_id": video.id,
+        "sha256": digest.hexdigest(),
+        "url": url_for('views.view_video', video_id=video.id)
+    }), 201
+
+# =========================
+# CANCEL UPLOAD ROUTE
+# =========================
+
+@uploads.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    upload = get_upload_or_404(upload_id)
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    db.session.delete(upload)
+    db.session.commit()
+    return '', 204
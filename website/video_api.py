@@ -1,12 +1,43 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, abort, current_app, send_from_directory
 from .models import Video
+from .view_counter import view_counter
 from . import db
+from . import media_store
+import os
 
 video_api = Blueprint("video_api", __name__)
 
 @video_api.route("/video_api/increment_views/<int:video_id>", methods=["GET"])
 def increment_video_views(video_id):
-    video = Video.query.get(video_id)
-    video.views += 1
-    db.session.commit()
-    return jsonify({"views": video.views})
+    # Stored views plus this worker's not-yet-flushed ones, including this view
+    views = view_counter.increment(video_id)
+    if views is None:
+        abort(404)
+    return jsonify({"views": views})
+
+# =========================
+# VIDEO STREAMING ROUTE
+# =========================
+
+@video_api.route("/video_api/stream/<int:video_id>", methods=["GET"])
+def stream_video(video_id):
+    row = db.session.query(Video.video).filter_by(id=video_id).first()
+    if row is None:
+        abort(404)
+
+    # conditional=True answers Range requests with 206 partial content and
+    # handles ETag / If-None-Match / If-Range. The body is streamed from the
+    # open file in small blocks (or by the server's sendfile through
+    # wsgi.file_wrapper, or by the front proxy with USE_X_SENDFILE), so a
+    # worker never holds a whole video in memory.
+    path = media_store.locate(row.video, 'videos')
+    response = send_from_directory(
+        os.path.dirname(path),
+        os.path.basename(path),
+        conditional=True,
+        etag=True,
+        max_age=current_app.config.get('VIDEO_CACHE_MAX_AGE', 3600)
+    )
+    # Werkzeug only advertises this on 206s; players want it up front to seek
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,112 @@
+import atexit
+import threading
+from sqlalchemy import update, bindparam, func
+from . import db
+from .models import Video
+
+
+# =========================
+# BUFFERED VIEW COUNTER
+# =========================
+
+class ViewCounter:
+    """Buffers video view increments in memory and writes them in batches.
+
+    Each flush is one transaction running
+    ``UPDATE video SET views = coalesce(views, 0) + :n WHERE id = :id`` per
+    buffered video, so increments from several workers add up instead of
+    overwriting each other, and a burst of views costs one write rather than
+    one per view.
+
+    The lock only guards the in-memory dict: a view never waits on the
+    database or on a flush in progress. The total ``increment`` returns is
+    the stored count plus what is pending, so a view landing mid-flush can
+    be shown one batch short or over until the next request.
+    """
+
+    def __init__(self, flush_interval=5.0, max_pending=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self._flush_in_app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get('VIEW_FLUSH_MAX_PENDING', self.max_pending)
+
+    def increment(self, video_id):
+        """Buffer one view and return the video's views including it.
+
+        Returns None, buffering nothing, if there is no such video.
+        """
+        stored = db.session.query(Video.views).filter_by(id=video_id).first()
+        if stored is None:
+            return None
+        with self._lock:
+            count = self._pending.get(video_id, 0) + 1
+            self._pending[video_id] = count
+            total = sum(self._pending.values())
+
+        self._ensure_thread()
+        if total >= self.max_pending:
+            self._wake.set()
+        return (stored.views or 0) + count
+
+    def pending(self, video_id):
+        with self._lock:
+            return self._pending.get(video_id, 0)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        views = Video.__table__.c.views
+        stmt = update(Video.__table__)\
+            .where(Video.__table__.c.id == bindparam('video_id'))\
+            .values(views=func.coalesce(views, 0) + bindparam('count'))
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt, [
+                    {'video_id': video_id, 'count': count}
+                    for video_id, count in batch.items()
+                ])
+        except Exception:
+            # Put the batch back so the next flush retries it
+            with self._lock:
+                for video_id, count in batch.items():
+                    self._pending[video_id] = self._pending.get(video_id, 0) + count
+            raise
+        return len(batch)
+
+    def _flush_in_app(self):
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="view-counter-flush", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._flush_in_app()
+            except Exception:
+                self.app.logger.exception("Flushing buffered video views failed")
+
+
+view_counter = ViewCounter()
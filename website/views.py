@@ -3,6 +3,18 @@ from flask_login import login_required, current_user
 from .models import Post, User, Comment, Like, Art, ArtComment, Video, VideoComment, Notification
 from . import db
 from .auth import logout_user
+from .pagination import keyset_page
+from .feed import load_cards, load_cached_cards, card_options
+from .cache import query_cache
+from .routing import use_replica
+from sqlalchemy.orm import joinedload
+from . import timeline
+from . import follow_graph
+from .notifier import notify, retract, mark_read
+from . import media_jobs
+from . import media_store
+from . import search_index
+from .typeahead import username_index
 from werkzeug.utils import secure_filename
 import os
 import uuid
@@ -10,20 +22,36 @@ import uuid
 
 views = Blueprint("views", __name__)
 
-UPLOAD_FOLDER = os.path.join('website', 'static', 'art')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-VIDEO_UPLOAD_FOLDER = os.path.join('website', 'static', 'videos')
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'mov'}
 
 def allowed_video(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_VIDEO_EXTENSIONS
 
+LIKEABLE_MODELS = {'post': Post, 'art': Art, 'video': Video}
+
+def reload_current_user():
+    # current_user can be a cached snapshot up to USER_CACHE_TTL old; write
+    # paths that act on its file or counter columns read the row first
+    return db.session.get(User, current_user.id, populate_existing=True)
+
+# Users per page of /users
+USERS_PER_PAGE = 50
+
+def bump_like_count(post_type, post_id, delta):
+    # Done as "like_count = like_count + delta" in the same transaction as
+    # the Like row, so concurrent toggles can't lose an update.
+    model = LIKEABLE_MODELS[post_type]
+    model.query.filter_by(id=post_id).update(
+        {model.like_count: model.like_count + delta}
+    )
+
 # =========================
 # HOME ROUTE 
 # =========================
@@ -31,10 +59,35 @@ def allowed_video(filename):
 @views.route('/')
 @views.route('/home')
 @login_required
+@use_replica
 def home():
-    posts = Post.query.all()
-    posts = Post.query.order_by(Post.date_created.desc()).all()
-    return render_template("home.html", user=current_user, posts=posts)
+    posts, next_cursor, liked_posts = load_cards(
+        Post.query, Post, request.args.get('cursor'), current_user
+    )
+    return render_template(
+        "home.html",
+        user=current_user,
+        posts=posts,
+        next_cursor=next_cursor,
+        liked_posts=liked_posts
+    )
+
+# =========================
+# FOLLOWING FEED ROUTE 
+# =========================
+
+@views.route('/feed')
+@login_required
+@use_replica
+def following_feed():
+    items, next_cursor, liked = timeline.read(current_user, request.args.get('cursor'))
+    return render_template(
+        "timeline.html",
+        user=current_user,
+        items=items,
+        next_cursor=next_cursor,
+        liked=liked
+    )
 
 # =========================
 # CREATE POST ROUTE 
@@ -52,6 +105,8 @@ def create_post():
         else:
             post = Post(text=text, user_id=current_user.id)
             db.session.add(post)
+            db.session.flush()
+            timeline.fan_out(post, 'post')
             db.session.commit()
             flash('Post has been created!', category='success')
             return redirect(url_for('views.home'))
@@ -73,6 +128,7 @@ def delete_post(id):
     elif current_user.id != post.user_id:  
         flash('You do not have permission to delete this post!', category='error')
     else:
+        timeline.remove('post', post.id)
         db.session.delete(post)
         db.session.commit()
         flash('Post has been deleted!', category='success')
@@ -101,14 +157,13 @@ def create_comment(post_id):
     db.session.add(comment)
 
     if post.user_id != current_user.id:
-        notification = Notification(
+        notify(
             user_id=post.user_id,
             from_user_id=current_user.id,
             type='comment',
             object_id=post.id,
             object_type='post'
         )
-        db.session.add(notification)
 
     db.session.commit()
     return redirect(request.referrer)
@@ -169,20 +224,30 @@ def like_post(post_type, post_id):
 
     if existing_like:
         db.session.delete(existing_like)
+        bump_like_count(post_type, post_id, -1)
+
+        if owner_id != current_user.id:
+            retract(
+                user_id=owner_id,
+                from_user_id=current_user.id,
+                type='like',
+                object_id=post_id,
+                object_type=post_type
+            )
     else:
         db.session.add(
             Like(user_id=current_user.id, post_id=post_id, post_type=post_type)
         )
+        bump_like_count(post_type, post_id, 1)
 
         if owner_id != current_user.id:
-            notification = Notification(
+            notify(
                 user_id=owner_id,
                 from_user_id=current_user.id,
                 type='like',
                 object_id=post_id,
                 object_type=post_type
             )
-            db.session.add(notification)
 
     db.session.commit()
     return redirect(request.referrer)
@@ -198,16 +263,15 @@ def like_post(post_type, post_id):
 def follow(user_id):
     user = User.query.get_or_404(user_id)
 
-    if not current_user.is_following(user):
-        current_user.follow(user)
+    if follow_graph.follow(current_user.id, user.id):
+        timeline.backfill(current_user.id, user.id)
 
         if user.id != current_user.id:
-            notification = Notification(
+            notify(
                 user_id=user.id,
                 from_user_id=current_user.id,
                 type='follow'
             )
-            db.session.add(notification)
 
         db.session.commit()
 
@@ -221,8 +285,9 @@ def follow(user_id):
 @login_required
 def unfollow(user_id):
     user = User.query.get_or_404(user_id)
-    if current_user.is_following(user):
-        current_user.unfollow(user)
+    if follow_graph.unfollow(current_user.id, user.id):
+        timeline.purge(current_user.id, user.id)
+        retract(user_id=user.id, from_user_id=current_user.id, type='follow')
         db.session.commit()
     return redirect(url_for('views.profile', user_id=user.id))
 
@@ -231,17 +296,41 @@ def unfollow(user_id):
 # =========================
 
 @views.route("/profile/<int:user_id>")
+@use_replica
 def profile(user_id):
 
     user = User.query.get_or_404(user_id)
-    posts = Post.query.filter_by(user_id=user.id).order_by(Post.date_created.desc()).all()
-    arts = Art.query.filter_by(user_id=user.id)\
-        .order_by(Art.date_created.desc()).all()
-
-    videos = Video.query.filter_by(user_id=user.id)\
-        .order_by(Video.date_created.desc()).all()
+    tags = [f"user:{user.id}"]
+    posts, posts_cursor, liked_posts = load_cached_cards(
+        f"profile:{user.id}:posts", tags,
+        Post.query.filter_by(user_id=user.id), Post,
+        request.args.get('posts_cursor'), current_user
+    )
+    arts, arts_cursor, liked_arts = load_cached_cards(
+        f"profile:{user.id}:arts", tags,
+        Art.query.filter_by(user_id=user.id), Art,
+        request.args.get('arts_cursor'), current_user
+    )
+    videos, videos_cursor, liked_videos = load_cached_cards(
+        f"profile:{user.id}:videos", tags,
+        Video.query.filter_by(user_id=user.id), Video,
+        request.args.get('videos_cursor'), current_user
+    )
 
-    return render_template("profile.html", user=user, posts=posts, arts=arts, videos=videos)
+    return render_template(
+        "profile.html",
+        user=user,
+        posts=posts,
+        arts=arts,
+        videos=videos,
+        posts_cursor=posts_cursor,
+        arts_cursor=arts_cursor,
+        videos_cursor=videos_cursor,
+        liked_posts=liked_posts,
+        liked_arts=liked_arts,
+        liked_videos=liked_videos,
+        is_following=current_user.is_authenticated and follow_graph.is_following(current_user.id, user.id)
+    )
 
 
 # =========================
@@ -250,9 +339,23 @@ def profile(user_id):
 
 @views.route('/users')
 @login_required
+@use_replica
 def list_users():
-    users = User.query.all()
-    return render_template("user_list.html", users=users, user=current_user)
+    after = request.args.get('after', 0, type=int)
+
+    def load_page():
+        users = User.query.filter(User.id > after).order_by(User.id)\
+            .limit(USERS_PER_PAGE + 1).all()
+        next_after = users[USERS_PER_PAGE - 1].id if len(users) > USERS_PER_PAGE else None
+        return users[:USERS_PER_PAGE], next_after
+
+    users, next_after = query_cache.get_or_load(f"users:after:{after}", ["users"], load_page)
+    return render_template(
+        "user_list.html",
+        users=query_cache.attach(users),
+        next_after=next_after,
+        user=current_user
+    )
 
 # =========================
 # FOLLOWERS ROUTE 
@@ -260,10 +363,17 @@ def list_users():
 
 @views.route("/followers/<int:user_id>")
 @login_required
+@use_replica
 def followers(user_id):
     user = User.query.get_or_404(user_id)
-    followers = user.followers.all()  # returns list of Follow objects
-    return render_template("followers.html", user=user, followers=followers)
+    followers, next_cursor = follow_graph.followers_page(user.id, request.args.get('cursor'))
+    return render_template(
+        "followers.html",
+        user=user,
+        followers=followers,
+        next_cursor=next_cursor,
+        followed_ids=follow_graph.followed_among(current_user.id, [u.id for u in followers])
+    )
 
 # =========================
 # FOLLOWING ROUTE 
@@ -271,10 +381,17 @@ def followers(user_id):
 
 @views.route("/following/<int:user_id>")
 @login_required
+@use_replica
 def following(user_id):
     user = User.query.get_or_404(user_id)
-    following = user.followed.all()  # returns list of Follow objects
-    return render_template("following.html", user=user, following=following)
+    following, next_cursor = follow_graph.following_page(user.id, request.args.get('cursor'))
+    return render_template(
+        "following.html",
+        user=user,
+        following=following,
+        next_cursor=next_cursor,
+        followed_ids=follow_graph.followed_among(current_user.id, [u.id for u in following])
+    )
 
 # =========================
 # EDIT PROFILE ROUTE 
@@ -283,8 +400,6 @@ def following(user_id):
 @views.route('/edit-profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
-    UPLOAD_FOLDER = os.path.join('website', 'static', 'uploads')
-
     if request.method == 'POST':
         username = request.form.get("username")
         bio = request.form.get("bio")
@@ -292,29 +407,26 @@ def edit_profile():
         if len(username) < 2:
             flash('Username is too short!', category='error')
         else:
+            reload_current_user()
+
             # Handle profile picture upload
             f = request.files.get('file')
             if f and f.filename != '':
-                # Delete the old profile picture if it exists
-                if current_user.profile_image:
-                    old_path = os.path.join(UPLOAD_FOLDER, current_user.profile_image)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
-
-                # Generate unique filename
-                ext = os.path.splitext(f.filename)[1]  # Gets file extension
-                unique_filename = f"{uuid.uuid4().hex}{ext}"
-                save_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                f.save(save_path)
-
-                # Update profile image field
-                current_user.profile_image = unique_filename
+                # Let go of the old profile picture if it exists
+                media_store.release(current_user.profile_image, 'uploads')
+
+                # Update profile image field; resized copies follow later
+                current_user.profile_image = media_store.save(f)
+                current_user.profile_thumb = None
+                media_jobs.enqueue('avatar', current_user.id)
 
             # Update other fields
+            old_username = current_user.username
             current_user.username = username
             current_user.bio = bio
             db.session.commit()
+            username_index.rename(current_user.id, old_username, username)
+            media_jobs.media_worker.wake()
             flash('Profile updated!', category='success')
             return redirect(url_for('views.profile', user_id=current_user.id))
 
@@ -347,14 +459,13 @@ def comment_art(art_id):
     db.session.add(comment)
 
     if art.user_id != current_user.id:
-        notification = Notification(
+        notify(
             user_id=art.user_id,
             from_user_id=current_user.id,
             type='comment',
             object_id=art.id,
             object_type='art'
         )
-        db.session.add(notification)
 
     db.session.commit()
     return redirect(request.referrer)
@@ -393,6 +504,7 @@ def videos():
 
 @views.route('/media', methods=['GET', 'POST'])
 @login_required
+@use_replica
 def media():
     # Handle uploads
     if request.method == 'POST':
@@ -406,39 +518,34 @@ def media():
 
         # ART upload
         if upload_type == 'art' and allowed_file(file.filename):
-            ext = os.path.splitext(file.filename)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(filepath)
-
             new_art = Art(
                 title=title,
-                art=filename,
+                art=media_store.save(file),
                 user_id=current_user.id
             )
 
             db.session.add(new_art)
+            db.session.flush()
+            timeline.fan_out(new_art, 'art')
+            media_jobs.enqueue('art', new_art.id)
             db.session.commit()
+            media_jobs.media_worker.wake()
             flash('Art posted!', category='success')
 
         # VIDEO upload
         elif upload_type == 'video' and allowed_video(file.filename):
-            os.makedirs(VIDEO_UPLOAD_FOLDER, exist_ok=True)
-
-            ext = os.path.splitext(file.filename)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-            filepath = os.path.join(VIDEO_UPLOAD_FOLDER, filename)
-            file.save(filepath)
-
             new_video = Video(
                 title=title,
-                video=filename,
+                video=media_store.save(file),
                 user_id=current_user.id
             )
 
             db.session.add(new_video)
+            db.session.flush()
+            timeline.fan_out(new_video, 'video')
+            media_jobs.enqueue('video', new_video.id)
             db.session.commit()
+            media_jobs.media_worker.wake()
             flash('Video uploaded!', category='success')
 
         else:
@@ -446,15 +553,25 @@ def media():
 
         return redirect(url_for('views.media'))
 
-    # Fetch both
-    arts = Art.query.order_by(Art.date_created.desc()).all()
-    videos = Video.query.order_by(Video.date_created.desc()).all()
+    # Fetch one page of each
+    arts, arts_cursor, liked_arts = load_cached_cards(
+        "gallery:art", ["gallery:art"],
+        Art.query, Art, request.args.get('arts_cursor'), current_user
+    )
+    videos, videos_cursor, liked_videos = load_cached_cards(
+        "gallery:video", ["gallery:video"],
+        Video.query, Video, request.args.get('videos_cursor'), current_user
+    )
 
     return render_template(
         "gallery.html",
         user=current_user,
         arts=arts,
-        videos=videos
+        videos=videos,
+        arts_cursor=arts_cursor,
+        videos_cursor=videos_cursor,
+        liked_arts=liked_arts,
+        liked_videos=liked_videos
     )
 
 # =========================
@@ -479,14 +596,13 @@ def comment_video(video_id):
     db.session.add(comment)
 
     if video.user_id != current_user.id:
-        notification = Notification(
+        notify(
             user_id=video.user_id,
             from_user_id=current_user.id,
             type='comment',
             object_id=video.id,
             object_type='video'
         )
-        db.session.add(notification)
 
     db.session.commit()
     return redirect(request.referrer)
@@ -527,6 +643,7 @@ def like_media(post_type, post_id):
 
     if existing_like:
         db.session.delete(existing_like)
+        bump_like_count(post_type, post_id, -1)
         db.session.commit()
     else:
         like = Like(
@@ -535,6 +652,7 @@ def like_media(post_type, post_id):
             post_type=post_type
         )
         db.session.add(like)
+        bump_like_count(post_type, post_id, 1)
         db.session.commit()
 
     return redirect(request.referrer)
@@ -553,6 +671,8 @@ def delete_art(id):
     elif current_user.id != art.user_id:  
         flash('You do not have permission to delete this Artwork!', category='error')
     else:
+        timeline.remove('art', art.id)
+        media_store.release(art.art, 'art')
         db.session.delete(art)
         db.session.commit()
         flash('Artwork has been deleted!', category='success')
@@ -573,6 +693,8 @@ def delete_video(id):
     elif current_user.id != video.user_id:  
         flash('You do not have permission to delete this Video!', category='error')
     else:
+        timeline.remove('video', video.id)
+        media_store.release(video.video, 'videos')
         db.session.delete(video)
         db.session.commit()
         flash('Video has been deleted!', category='success')
@@ -589,8 +711,20 @@ def delete_user(user_id):
     if current_user.id != user_id:
         abort(403)
 
+    reload_current_user()
+
+    # Arts and videos go with the account, so give up their files too
+    media_store.release(current_user.profile_image, 'uploads')
+    for (name,) in db.session.query(Art.art).filter_by(user_id=user_id):
+        media_store.release(name, 'art')
+    for (name,) in db.session.query(Video.video).filter_by(user_id=user_id):
+        media_store.release(name, 'videos')
+
+    username = current_user.username
+    follow_graph.forget(user_id)
     db.session.delete(current_user)
     db.session.commit()
+    username_index.remove(user_id, username)
     logout_user()
     return redirect(url_for('auth.login'))
 
@@ -600,6 +734,7 @@ def delete_user(user_id):
 
 @views.route("/search")
 @login_required
+@use_replica
 def search():
     q = request.args.get("q", "").strip()
 
@@ -678,19 +813,23 @@ def search():
         )
 
     # -----------------------------
-    # Normal text search
+    # Normal text search (FTS5, best matches first)
     # -----------------------------
-    users = User.query.filter(
-        User.username.ilike(f"%{q}%")
-    ).all()
+    users, users_cursor = search_index.search(
+        User, q, request.args.get("users_cursor")
+    )
 
-    posts = Post.query.filter(
-        Post.text.ilike(f"%{q}%")
-    ).all()
+    posts, posts_cursor = search_index.search(
+        Post, q, request.args.get("posts_cursor")
+    )
 
-    arts = Art.query.filter(Art.title.ilike(f"%{q}%")).all()
-    
-    videos = Video.query.filter(Video.title.ilike(f"%{q}%")).all()
+    arts, arts_cursor = search_index.search(
+        Art, q, request.args.get("arts_cursor")
+    )
+
+    videos, videos_cursor = search_index.search(
+        Video, q, request.args.get("videos_cursor")
+    )
 
 
     return render_template(
@@ -699,7 +838,11 @@ def search():
         users=users,
         posts=posts,
         arts=arts,
-        videos=videos
+        videos=videos,
+        users_cursor=users_cursor,
+        posts_cursor=posts_cursor,
+        arts_cursor=arts_cursor,
+        videos_cursor=videos_cursor
     )
 
 
@@ -710,21 +853,31 @@ def search():
 @views.route('/notifications')
 @login_required
 def notifications():
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(Notification.date_created.desc()).all()
+    notifications, next_cursor = keyset_page(
+        Notification.query.filter_by(user_id=current_user.id)
+            .options(joinedload(Notification.from_user)),
+        Notification,
+        request.args.get('cursor')
+    )
 
-    Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).update({Notification.is_read: True})
+    # Names for the "alice, bob and 3 others" line, in one query
+    actor_ids = {a for n in notifications for a in n.recent_actors[1:]}
+    actors = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(actor_ids))
+    ) if actor_ids else {}
 
-    db.session.commit()
+    mark_read(current_user.id, notifications)
 
-    return render_template(
+    # Render before committing so the page still highlights what was unread
+    # and the expired rows aren't reloaded one by one
+    page = render_template(
         'notifications.html',
-        notifications=notifications
+        notifications=notifications,
+        next_cursor=next_cursor,
+        actors=actors
     )
+    db.session.commit()
+    return page
 
 # =========================
 # ART ID ROUTE 
@@ -732,8 +885,15 @@ def notifications():
 
 @views.route("/art/<int:art_id>")
 @login_required
+@use_replica
 def view_art(art_id):
-    art = Art.query.get_or_404(art_id)
+    art = query_cache.get_or_load(
+        f"art:{art_id}", [f"art:{art_id}"],
+        lambda: Art.query.options(*card_options(Art)).filter_by(id=art_id).first()
+    )
+    if art is None:
+        abort(404)
+    art = query_cache.attach([art])[0]
 
     return render_template(
         "art_detail.html",
@@ -747,8 +907,15 @@ def view_art(art_id):
 
 @views.route("/video/<int:video_id>")
 @login_required
+@use_replica
 def view_video(video_id):
-    video = Video.query.get_or_404(video_id)
+    video = query_cache.get_or_load(
+        f"video:{video_id}", [f"video:{video_id}"],
+        lambda: Video.query.options(*card_options(Video)).filter_by(id=video_id).first()
+    )
+    if video is None:
+        abort(404)
+    video = query_cache.attach([video])[0]
 
     return render_template(
         "video_detail.html",